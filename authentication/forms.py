@@ -2,8 +2,8 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from .validators import UsernameValidator, ComplexPasswordValidator
-from .models import UserLoginAttempt
 
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(
@@ -45,9 +45,7 @@ class CustomUserCreationForm(UserCreationForm):
         validator = UsernameValidator()
         validator.validate(username)
         
-        if User.objects.filter(username=username).exists():
-            raise ValidationError("A user with that username already exists.")
-        
+        # Uniqueness is checked by the model validation of UserCreationForm
         return username
     
     def clean_password1(self):
@@ -61,7 +59,7 @@ class CustomUserCreationForm(UserCreationForm):
         user.email = self.cleaned_data['email']
         if commit:
             user.save()
-            # UserLoginAttempt will be created by the signal
+            # The UserProfile is created by the signal
         return user
 
 class CustomAuthenticationForm(AuthenticationForm):
@@ -79,25 +77,38 @@ class CustomAuthenticationForm(AuthenticationForm):
         })
     )
     
+    # Set by clean(): the user id the username belongs to (None if there is no such
+    # user), their lockout state and last login IP, so the view records the
+    # outcome without looking the user up again
+    user_id = None
+    failed_attempts = 0
+    locked_until = None
+    last_login_ip = None
+
     def clean(self):
         username = self.cleaned_data.get('username')
-        password = self.cleaned_data.get('password')
         
         if username:
-            try:
-                user = User.objects.get(username=username)
-                login_attempt, created = UserLoginAttempt.objects.get_or_create(user=user)
+            # One query for the user id, lockout state and profile, without writing anything
+            row = User.objects.filter(username=username).values_list(
+                'pk', 'login_attempts__failed_attempts', 'login_attempts__locked_until', 'profile__last_login_ip',
+            ).first()
+            if row:
+                self.user_id, failed_attempts, self.locked_until, self.last_login_ip = row
+                self.failed_attempts = failed_attempts or 0
                 
-                if login_attempt.is_account_locked():
-                    time_remaining = login_attempt.time_until_unlock()
-                    if time_remaining:
-                        minutes = int(time_remaining.total_seconds() // 60)
-                        seconds = int(time_remaining.total_seconds() % 60)
-                        raise ValidationError(
-                            f"Account is locked due to too many failed attempts. "
-                            f"Try again in {minutes}m {seconds}s."
-                        )
-            except User.DoesNotExist:
-                pass
+                if self.locked_until and self.locked_until > timezone.now():
+                    time_remaining = self.locked_until - timezone.now()
+                    minutes = int(time_remaining.total_seconds() // 60)
+                    seconds = int(time_remaining.total_seconds() % 60)
+                    raise ValidationError(
+                        f"Account is locked due to too many failed attempts. "
+                        f"Try again in {minutes}m {seconds}s.",
+                        code='locked',
+                    )
         
         return super().clean()
+
+    def is_locked_out(self):
+        """True if clean() rejected the login because the account is locked"""
+        return any(error.code == 'locked' for error in self.errors.as_data().get('__all__', []))
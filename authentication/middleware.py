@@ -1,41 +1,131 @@
-from django.contrib.auth import login
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core import signing
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+RESTORE_COOKIE_NAME = 'session_restore'
+RESTORE_SALT = 'authentication.middleware.session-restore'
+# Set in a session once a restore was attempted, so it is tried at most once
+RESTORED_SESSION_KEY = '_session_restored'
+# Unix time the session's expiry was last pushed back
+REFRESHED_SESSION_KEY = '_session_refreshed'
+
+
+def set_restore_cookie(response, user):
+    """
+    Give the browser a signed token that can re-establish the login if the
+    session store loses the session (e.g. a fresh /tmp database on Vercel).
+
+    The token carries everything needed to rebuild the auth session keys, so
+    restoring does not look anything up. It stops working when the password
+    changes, like the session itself.
+    """
+    token = signing.dumps(
+        {'id': user.pk, 'backend': user.backend, 'hash': user.get_session_auth_hash()},
+        salt=RESTORE_SALT,
+        compress=True,
+    )
+    response.set_cookie(
+        RESTORE_COOKIE_NAME,
+        token,
+        max_age=settings.SESSION_COOKIE_AGE,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite=settings.SESSION_COOKIE_SAMESITE,
+    )
+    return response
+
+
+def delete_restore_cookie(response):
+    response.delete_cookie(RESTORE_COOKIE_NAME, samesite=settings.SESSION_COOKIE_SAMESITE)
+    return response
+
 
 class VercelSessionPersistenceMiddleware:
     """
     Custom middleware to help with session persistence on Vercel.
     Since Vercel has ephemeral storage, this helps restore sessions.
+
+    When the session has no login but the browser presents a valid restore
+    token, the auth keys are written straight into the session. The user row
+    is only loaded if the view asks for request.user, as on any authenticated
+    request, and login() is not called, so the session key isn't cycled and
+    last_login isn't rewritten.
     """
-    
+
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Check if user is not authenticated but has valid session data
-        if not request.user.is_authenticated:
-            user_id = request.session.get('user_id')
-            username = request.session.get('username')
-            is_authenticated = request.session.get('is_authenticated')
-            
-            if user_id and username and is_authenticated:
-                # Try to restore the user's session
-                try:
-                    user = User.objects.get(id=user_id, username=username)
-                    login(request, user)
-                    # Refresh session flags
-                    request.session['user_id'] = user.id
-                    request.session['username'] = user.username
-                    request.session['is_authenticated'] = True
-                    request.session.modified = True
-                except User.DoesNotExist:
-                    # Clear invalid session data
-                    if 'user_id' in request.session:
-                        del request.session['user_id']
-                    if 'username' in request.session:
-                        del request.session['username']
-                    if 'is_authenticated' in request.session:
-                        del request.session['is_authenticated']
-                    request.session.modified = True
-        
+        token = request.COOKIES.get(RESTORE_COOKIE_NAME)
+        if token and SESSION_KEY not in request.session and not request.session.get(RESTORED_SESSION_KEY):
+            self.restore(request, token)
+
         response = self.get_response(request)
+
+        if getattr(request, '_restore_failed', False):
+            delete_restore_cookie(response)
+        return response
+
+    def restore(self, request, token):
+        request.session[RESTORED_SESSION_KEY] = True
+        try:
+            payload = signing.loads(token, salt=RESTORE_SALT, max_age=settings.SESSION_COOKIE_AGE)
+        except signing.BadSignature:
+            request._restore_failed = True
+            return
+        if payload.get('backend') not in settings.AUTHENTICATION_BACKENDS:
+            request._restore_failed = True
+            return
+
+        if request.session.session_key:
+            # Don't authenticate a session id the browser already had (fixation)
+            request.session.cycle_key()
+        request.session[SESSION_KEY] = str(payload['id'])
+        request.session[BACKEND_SESSION_KEY] = payload['backend']
+        request.session[HASH_SESSION_KEY] = payload['hash']
+
+        # AuthenticationMiddleware may already have resolved an anonymous user
+        if hasattr(request, '_cached_user'):
+            del request._cached_user
+        request.user = SimpleLazyObject(lambda: self.get_restored_user(request))
+
+    def get_restored_user(self, request):
+        user = auth.get_user(request)
+        # The token no longer matches a valid login (user gone, password changed)
+        request._restore_failed = not user.is_authenticated
+        return user
+
+
+class SessionRefreshMiddleware:
+    """
+    Sliding session expiry without saving the session on every request.
+
+    Replaces SESSION_SAVE_EVERY_REQUEST: an unmodified session is only saved
+    (pushing its expiry and the cookie's max-age back) once
+    SESSION_REFRESH_FRACTION of its lifetime has passed since the last refresh.
+    With the default 0.1 and a 14 day session that is at most one session write
+    per user every ~33 hours instead of one per request. Must come after
+    SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.fraction = getattr(settings, 'SESSION_REFRESH_FRACTION', 0.1)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = request.session
+        # Don't load a session the request never touched
+        if not session.accessed or session.is_empty() or session.get_expire_at_browser_close():
+            return response
+
+        # A modified session is saved anyway, so it records the refresh for free
+        now = timezone.now().timestamp()
+        refreshed = session.get(REFRESHED_SESSION_KEY, 0)
+        if session.modified or now - refreshed >= session.get_expiry_age() * self.fraction:
+            session[REFRESHED_SESSION_KEY] = int(now)
         return response
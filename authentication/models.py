@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Q, Value, When
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
@@ -17,39 +18,56 @@ class UserLoginAttempt(models.Model):
     def __str__(self):
         return f"{self.user.username} - Attempts: {self.failed_attempts}"
 
-    def reset_attempts(self):
-        """Reset failed attempts after successful login"""
-        self.failed_attempts = 0
-        self.is_locked = False
-        self.locked_until = None
-        self.save()
+    @classmethod
+    def record_failure(cls, user_id):
+        """
+        Count a failed login for `user_id` and lock the account once the
+        threshold is reached. Returns (failed_attempts, locked_until).
 
-    def add_failed_attempt(self):
-        """Add a failed attempt and lock if threshold reached"""
-        self.failed_attempts += 1
-        self.last_attempt = timezone.now()
-        
-        if self.failed_attempts >= getattr(settings, 'ACCOUNT_LOCKOUT_ATTEMPTS', 3):
-            self.is_locked = True
-            lockout_time = getattr(settings, 'ACCOUNT_LOCKOUT_TIME', 300)  # 5 minutes default
-            self.locked_until = timezone.now() + timedelta(seconds=lockout_time)
-        
-        self.save()
+        One UPDATE computes everything from the stored row, so concurrent
+        failures never lose an increment; a lock that has run out starts the
+        count again.
+        """
+        now = timezone.now()
+        threshold = getattr(settings, 'ACCOUNT_LOCKOUT_ATTEMPTS', 3)
+        lockout_time = getattr(settings, 'ACCOUNT_LOCKOUT_TIME', 300)  # 5 minutes default
+        expired = Q(locked_until__isnull=False, locked_until__lte=now)
+        # Conditions on the row before the update: this failure reaches the threshold
+        locks = Q(failed_attempts__gte=threshold - 1) & ~expired
+        if threshold <= 1:
+            locks |= expired
+
+        attempts = cls.objects.filter(user_id=user_id)
+        updated = attempts.update(
+            failed_attempts=Case(When(expired, then=Value(1)), default=F('failed_attempts') + 1),
+            last_attempt=now,
+            is_locked=Case(When(locks, then=Value(True)), When(expired, then=Value(False)), default=F('is_locked')),
+            locked_until=Case(
+                When(locks, then=Value(now + timedelta(seconds=lockout_time))),
+                When(expired, then=Value(None)),
+                default=F('locked_until'),
+            ),
+            updated_at=now,
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id)
+            except IntegrityError:
+                pass  # Created concurrently
+            return cls.record_failure(user_id)
+        return attempts.values_list('failed_attempts', 'locked_until').get()
+
+    @classmethod
+    def clear(cls, user_id):
+        """Forget failed attempts after a successful login"""
+        cls.objects.filter(user_id=user_id).filter(Q(failed_attempts__gt=0) | Q(is_locked=True)).update(
+            failed_attempts=0, is_locked=False, locked_until=None, updated_at=timezone.now(),
+        )
 
     def is_account_locked(self):
-        """Check if account is currently locked"""
-        if not self.is_locked:
-            return False
-        
-        if self.locked_until and timezone.now() > self.locked_until:
-            # Unlock account if lockout time has passed
-            self.is_locked = False
-            self.locked_until = None
-            self.failed_attempts = 0
-            self.save()
-            return False
-        
-        return self.is_locked
+        """Check if account is currently locked; an expired lock is ignored, not cleared"""
+        return self.is_locked and bool(self.locked_until) and timezone.now() < self.locked_until
 
     def time_until_unlock(self):
         """Get remaining lockout time"""
@@ -71,3 +89,18 @@ class UserProfile(models.Model):
     
     def __str__(self):
         return f"{self.user.username} Profile"
+
+    @classmethod
+    def record_login_ip(cls, user_id, ip):
+        """
+        Store the IP of a successful login. Users that have no profile (created
+        with bulk_create or loaded from fixtures, which send no post_save) get one here.
+        """
+        profiles = cls.objects.filter(user_id=user_id)
+        if not profiles.update(last_login_ip=ip):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, last_login_ip=ip)
+            except IntegrityError:
+                # Created concurrently
+                profiles.update(last_login_ip=ip)
@@ -1,24 +1,17 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile, UserLoginAttempt
+from .models import UserProfile
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    """Create UserProfile when a new user is created"""
-    if created:
-        UserProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def create_user_login_attempt(sender, instance, created, **kwargs):
-    """Create UserLoginAttempt when a new user is created"""
-    if created:
-        UserLoginAttempt.objects.create(user=instance)
+def create_user_records(sender, instance, created, raw=False, **kwargs):
+    """
+    Create the UserProfile of a new user, in the same transaction as the user
+    when the caller saves it in one (registration and the admin do).
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Save UserProfile when user is saved"""
-    try:
-        instance.profile.save()
-    except UserProfile.DoesNotExist:
+    Later saves of the user (login() updating last_login, admin edits) write
+    nothing here; the profile is saved by whoever changes it. The lockout row
+    (UserLoginAttempt) is created by the first failed login.
+    """
+    if created and not raw:
         UserProfile.objects.create(user=instance)
@@ -1,3 +1,247 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .middleware import REFRESHED_SESSION_KEY, RESTORE_COOKIE_NAME, RESTORED_SESSION_KEY
+from .models import UserLoginAttempt, UserProfile
+
+
+class SessionRestoreTests(TestCase):
+    """VercelSessionPersistenceMiddleware restoring logins from the signed cookie"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='restoreuser', password='Secret123!')
+
+    def log_in(self):
+        response = self.client.post(reverse('authentication:login'), {
+            'username': 'restoreuser', 'password': 'Secret123!',
+        })
+        self.assertRedirects(response, reverse('expenses:dashboard'), fetch_redirect_response=False)
+        self.assertIn(RESTORE_COOKIE_NAME, response.cookies)
+
+    def lose_session_store(self):
+        # What a cold start with a fresh /tmp database looks like to the browser
+        Session.objects.all().delete()
+
+    def test_login_is_restored_after_session_loss(self):
+        self.log_in()
+        self.lose_session_store()
+
+        response = self.client.get(reverse('expenses:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.session[SESSION_KEY], str(self.user.pk))
+
+    def test_restore_does_not_query_users(self):
+        self.log_in()
+        self.lose_session_store()
+
+        # A view that never looks at request.user
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/static/does-not-exist.css')
+        self.assertFalse([query for query in queries if 'auth_user' in query['sql']])
+        self.assertIn(SESSION_KEY, self.client.session)
+
+    def test_restore_is_attempted_once_per_session(self):
+        self.log_in()
+        self.lose_session_store()
+        self.user.set_password('Changed123!')
+        self.user.save()
+
+        response = self.client.get(reverse('expenses:dashboard'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies[RESTORE_COOKIE_NAME].value, '')
+
+    def test_tampered_token_is_ignored(self):
+        self.log_in()
+        self.lose_session_store()
+        self.client.cookies[RESTORE_COOKIE_NAME] = self.client.cookies[RESTORE_COOKIE_NAME].value[:-2] + 'xx'
+
+        response = self.client.get(reverse('expenses:dashboard'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.client.session[RESTORED_SESSION_KEY])
+        self.assertEqual(response.cookies[RESTORE_COOKIE_NAME].value, '')
+
+    def test_logout_removes_token(self):
+        self.log_in()
+        response = self.client.get(reverse('authentication:logout'))
+        self.assertEqual(response.cookies[RESTORE_COOKIE_NAME].value, '')
+
+
+class SessionRefreshTests(TestCase):
+    """SessionRefreshMiddleware only saving sessions once a fraction of the TTL passed"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='refreshuser', password='Secret123!')
+        self.client.force_login(self.user)
+        # The first request records when the session was last refreshed
+        self.client.get(reverse('expenses:expense-summary'))
+
+    def session_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('expenses:expense-summary'))
+        self.assertEqual(response.status_code, 200)
+        writes = [query for query in queries if query['sql'].startswith(('UPDATE "django_session"', 'INSERT'))]
+        return response, writes
+
+    def test_reads_do_not_write_the_session(self):
+        for _ in range(3):
+            response, writes = self.session_writes()
+            self.assertEqual(writes, [])
+            self.assertNotIn('sessionid', response.cookies)
+
+    def test_session_is_refreshed_after_fraction_of_ttl(self):
+        session = self.client.session
+        session[REFRESHED_SESSION_KEY] -= int(session.get_expiry_age() * 0.1) + 1
+        session.save()
+
+        response, writes = self.session_writes()
+        self.assertEqual(len(writes), 1)
+        self.assertIn('sessionid', response.cookies)
+        self.assertEqual(self.session_writes()[1], [])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions_never_touch_the_database(self):
+        self.client = self.client_class()
+        self.client.force_login(self.user)
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('expenses:expense-summary'))
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+
+
+@override_settings(ACCOUNT_LOCKOUT_ATTEMPTS=3, ACCOUNT_LOCKOUT_TIME=300)
+class LoginLockoutTests(TestCase):
+    """Failed login counting and lockout"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lockoutuser', password='Secret123!')
+
+    def attempt(self, password):
+        return self.client.post(reverse('authentication:login'), {'username': 'lockoutuser', 'password': password})
+
+    def attempts(self):
+        return UserLoginAttempt.objects.get(user=self.user)
+
+    def test_lockout_after_threshold(self):
+        for remaining in (2, 1):
+            response = self.attempt('wrong')
+            self.assertContains(response, f'{remaining} attempts remaining')
+        self.assertContains(self.attempt('wrong'), 'Account locked')
+        self.assertTrue(self.attempts().is_account_locked())
+
+        # Locked: the right password is refused without being checked or counted
+        with CaptureQueriesContext(connection) as queries:
+            response = self.attempt('Secret123!')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(SESSION_KEY, self.client.session)
+        self.assertEqual(self.attempts().failed_attempts, 3)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "authentication_userloginattempt"')])
+
+    def test_successful_login_without_failures_writes_nothing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.attempt('Secret123!')
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse([query for query in queries if 'authentication_userloginattempt' in query['sql']
+                          and not query['sql'].startswith('SELECT')])
+
+    def test_successful_login_clears_failures(self):
+        self.attempt('wrong')
+        self.assertEqual(self.attempts().failed_attempts, 1)
+        self.assertEqual(self.attempt('Secret123!').status_code, 302)
+        self.assertEqual(self.attempts().failed_attempts, 0)
+
+    def test_expired_lock_restarts_the_count(self):
+        for _ in range(3):
+            self.attempt('wrong')
+        UserLoginAttempt.objects.filter(user=self.user).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertContains(self.attempt('wrong'), '2 attempts remaining')
+        attempts = self.attempts()
+        self.assertEqual((attempts.failed_attempts, attempts.is_locked, attempts.locked_until), (1, False, None))
+
+    def test_missing_attempt_row_is_created(self):
+        UserLoginAttempt.objects.filter(user=self.user).delete()
+        self.assertEqual(UserLoginAttempt.record_failure(self.user.pk)[0], 1)
+        self.assertEqual(UserLoginAttempt.record_failure(self.user.pk)[0], 2)
+
+
+class QueryCountTests(TestCase):
+    """Queries issued by the authentication views, so added round trips show up in review"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='queryuser', password='Secret123!')
+
+    def log_in(self):
+        return self.client.post(reverse('authentication:login'), {'username': 'queryuser', 'password': 'Secret123!'})
+
+    def test_register(self):
+        # Username check, then the user and profile INSERTs in one transaction (a savepoint here)
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('authentication:register'), {
+                'username': 'newuser', 'email': 'new@example.com',
+                'password1': 'Secret123!', 'password2': 'Secret123!',
+            })
+        self.assertRedirects(response, reverse('authentication:login'), fetch_redirect_response=False)
+        user = User.objects.get(username='newuser')
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+        self.assertFalse(UserLoginAttempt.objects.filter(user=user).exists())
+
+    def test_register_rejects_taken_username(self):
+        response = self.client.post(reverse('authentication:register'), {
+            'username': 'queryuser', 'email': 'other@example.com',
+            'password1': 'Secret123!', 'password2': 'Secret123!',
+        })
+        self.assertContains(response, 'A user with that username already exists.')
+
+    def test_login(self):
+        # Lockout state and profile, password check, profile IP, session INSERT and
+        # re-save, last_login
+        with self.assertNumQueries(11):
+            response = self.log_in()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(UserProfile.objects.get(user=self.user).last_login_ip, '127.0.0.1')
+
+        # Same IP as last time: the profile is not written
+        self.client.logout()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.log_in().status_code, 302)
+        self.assertEqual(len(queries), 10)
+        self.assertFalse([query for query in queries if 'authentication_userprofile' in query['sql']
+                          and not query['sql'].startswith('SELECT')])
+
+    def test_failed_profile_insert_rolls_back_the_user(self):
+        with mock.patch.object(UserProfile.objects, 'create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError), self.assertLogs('django.request', 'ERROR'):
+                self.client.post(reverse('authentication:register'), {
+                    'username': 'newuser', 'email': 'new@example.com',
+                    'password1': 'Secret123!', 'password2': 'Secret123!',
+                })
+        self.assertFalse(User.objects.filter(username='newuser').exists())
+
+    def test_login_creates_a_missing_profile(self):
+        UserProfile.objects.filter(user=self.user).delete()
+        self.assertEqual(self.log_in().status_code, 302)
+        self.assertEqual(UserProfile.objects.get(user=self.user).last_login_ip, '127.0.0.1')
+
+    def test_user_save_does_not_write_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.user.first_name = 'Query'
+            self.user.save()
+        self.assertFalse([query for query in queries if 'authentication_userprofile' in query['sql']])
+
+    def test_logout(self):
+        self.log_in()
+        # Session and user lookups, then the session DELETE; no sweep of expired sessions
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('authentication:logout'))
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(SESSION_KEY, self.client.session)
@@ -1,14 +1,16 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.contrib.auth import login, authenticate, logout
-from django.contrib.auth.models import User
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from django.views.decorators.csrf import csrf_protect
 from django.utils.decorators import method_decorator
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
-from .models import UserLoginAttempt
+from .middleware import delete_restore_cookie, set_restore_cookie
+from .models import UserLoginAttempt, UserProfile
 
 def get_client_ip(request):
     """Get client IP address"""
@@ -28,7 +30,9 @@ def register_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            user = form.save()
+            # The post_save receiver creates the profile in this transaction too
+            with transaction.atomic():
+                user = form.save()
             messages.success(request, 'Registration successful! You can now log in.')
             return redirect('authentication:login')
         else:
@@ -54,22 +58,18 @@ def login_view(request):
     if request.method == 'POST':
         form = CustomAuthenticationForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
+            # Authenticated by the form already; hashing the password again would double the cost
+            user = form.get_user()
             
             if user is not None:
-                # Reset login attempts on successful login
-                try:
-                    login_attempt = UserLoginAttempt.objects.get(user=user)
-                    login_attempt.reset_attempts()
-                except UserLoginAttempt.DoesNotExist:
-                    UserLoginAttempt.objects.create(user=user)
+                # Reset login attempts on successful login; users without failures write nothing
+                if form.failed_attempts or form.locked_until:
+                    UserLoginAttempt.clear(user.pk)
                 
-                # Update last login IP
-                if hasattr(user, 'profile'):
-                    user.profile.last_login_ip = get_client_ip(request)
-                    user.profile.save()
+                # Update last login IP, only when it changed
+                client_ip = get_client_ip(request)
+                if client_ip != form.last_login_ip:
+                    UserProfile.record_login_ip(user.pk, client_ip)
                 
                 login(request, user)
                 messages.success(request, f'Welcome back, {user.username}!')
@@ -77,29 +77,24 @@ def login_view(request):
                 # Set a session cookie to remember the login - 14 days
                 request.session.set_expiry(60 * 60 * 24 * 14)  # 14 days
                 
-                # Set additional session flags for better persistence
-                request.session['user_id'] = user.id
-                request.session['username'] = user.username
-                request.session['is_authenticated'] = True
-                request.session.modified = True
-                
-                return redirect('expenses:dashboard')
+                # Signed token so the login survives losing the session store
+                return set_restore_cookie(redirect('expenses:dashboard'), user)
         else:
             # Handle failed login attempt
             username = request.POST.get('username')
-            if username:
-                try:
-                    user = User.objects.get(username=username)
-                    login_attempt, created = UserLoginAttempt.objects.get_or_create(user=user)
-                    login_attempt.add_failed_attempt()
-                    
-                    remaining_attempts = 3 - login_attempt.failed_attempts
-                    if remaining_attempts > 0:
-                        messages.error(request, f'Invalid credentials. {remaining_attempts} attempts remaining.')
-                    else:
-                        messages.error(request, 'Account locked due to too many failed attempts.')
-                except User.DoesNotExist:
-                    messages.error(request, 'Invalid credentials.')
+            if form.is_locked_out():
+                # Rejected before the password was checked, so not counted again
+                messages.error(request, 'Account locked due to too many failed attempts.')
+            elif form.user_id is not None:
+                failed_attempts, locked_until = UserLoginAttempt.record_failure(form.user_id)
+                
+                remaining_attempts = settings.ACCOUNT_LOCKOUT_ATTEMPTS - failed_attempts
+                if remaining_attempts > 0:
+                    messages.error(request, f'Invalid credentials. {remaining_attempts} attempts remaining.')
+                else:
+                    messages.error(request, 'Account locked due to too many failed attempts.')
+            elif username:
+                messages.error(request, 'Invalid credentials.')
             else:
                 messages.error(request, 'Please enter valid credentials.')
     else:
@@ -112,9 +107,9 @@ def logout_view(request):
     """User logout view"""
     username = request.user.username
     
-    # Clear all session data
+    # Clear all session data (expired sessions are removed by `manage.py clearsessions`,
+    # not by a table-wide DELETE on every logout)
     request.session.flush()
-    request.session.clear_expired()  # Clear expired sessions
     
     # Django's logout function
     logout(request)
@@ -122,6 +117,7 @@ def logout_view(request):
     # Set cookie expiry to force browser to remove it
     response = redirect('authentication:login')
     response.delete_cookie('sessionid')
+    delete_restore_cookie(response)
     
     messages.success(request, f'Goodbye, {username}! You have been logged out successfully.')
     return response
@@ -0,0 +1,89 @@
+"""
+Performance benchmarks for Budget Tracker.
+
+Every module in this package is a standalone script, run from the project root:
+
+    python -m benchmarks.<module> --help
+
+Benchmarks always work against a scratch SQLite database in a temporary
+directory, so the development db.sqlite3 is never touched.
+"""
+import os
+import random
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+
+def setup_django(database_name=None):
+    """Point Django at a scratch database, run setup and return the database path"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'budget_tracker.settings')
+
+    from django.conf import settings
+
+    if database_name is None:
+        database_name = os.path.join(tempfile.mkdtemp(prefix='budget-bench-'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = database_name
+
+    import django
+    django.setup()
+    return database_name
+
+
+def migrate(app_label=None, migration_name=None):
+    """Migrate the scratch database, optionally to a specific migration"""
+    from django.core.management import call_command
+
+    args = [arg for arg in (app_label, migration_name) if arg]
+    call_command('migrate', *args, verbosity=0, interactive=False)
+
+
+def create_users(count, prefix='bench_user'):
+    """Create `count` users without password hashing and return them"""
+    from django.contrib.auth.models import User
+
+    users = [User(username=f'{prefix}_{i}', password='!') for i in range(count)]
+    User.objects.bulk_create(users)
+    return list(User.objects.filter(username__startswith=f'{prefix}_').order_by('id'))
+
+
+def seed_expenses(users, per_user, seed=0, batch_size=10000):
+    """
+    Insert `per_user` expenses for every user with a raw executemany.
+
+    This bypasses the ORM on purpose: it is the fastest way to reach millions of
+    rows with SQLite, and the benchmarks only care about the resulting table.
+    """
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from expenses.models import Expense
+
+    rng = random.Random(seed)
+    categories = [value for value, _ in Expense.CATEGORY_CHOICES]
+    now = timezone.now().replace(tzinfo=None)
+    sql = (
+        'INSERT INTO expenses_expense '
+        '(user_id, amount, description, category, transaction_type, date_created, updated_at) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s)'
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        batch = []
+        for user in users:
+            for i in range(per_user):
+                date_created = now - timedelta(seconds=rng.randrange(3 * 365 * 24 * 3600))
+                batch.append((
+                    user.id,
+                    str(Decimal(rng.randrange(100, 500000)) / 100),
+                    f'Transaction {i}',
+                    rng.choice(categories),
+                    'income' if rng.random() < 0.2 else 'expense',
+                    date_created.isoformat(' '),
+                    date_created.isoformat(' '),
+                ))
+                if len(batch) >= batch_size:
+                    cursor.executemany(sql, batch)
+                    batch = []
+        if batch:
+            cursor.executemany(sql, batch)
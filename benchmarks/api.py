@@ -0,0 +1,381 @@
+"""
+Load test of the API and pages through their real URL routes.
+
+    python -m benchmarks.api --users 4 --transactions 2000 --output results.json
+    python -m benchmarks.api --server --threads 8 --baseline baseline.json
+
+The scratch database is seeded deterministically from --seed: --users users
+with --transactions transactions each. Every scenario is then run by
+--threads workers, each logged in as one of the users, for --requests
+timed requests after --warmup untimed ones:
+
+- login: POST /auth/login/ from a fresh client
+- dashboard: GET /
+- list: GET /api/expenses/ (first page)
+- detail: GET /api/expenses/<id>/ of a random own transaction
+- create: POST /api/expenses/
+- summary: GET /api/summary/
+- reset: POST /api/reset/, each time after seeding --reset-rows new rows
+
+Requests go through Django's test client in the workers' threads, or with
+--server over HTTP to a threaded WSGI server on a local port, which also
+exercises CSRF and the request parsing of a real server.
+
+Throughput, latency percentiles and queries per request of every scenario
+are written to --output as JSON. With --baseline (an earlier --output file)
+the run fails with exit status 1 if a scenario got more than --tolerance
+slower at p95 or in throughput, runs more queries per request or has more
+errors than the baseline.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import platform
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmarks import create_users, migrate, seed_expenses, setup_django
+
+PASSWORD = 'Bench123!'
+SCENARIOS = ('login', 'dashboard', 'list', 'detail', 'create', 'summary', 'reset')
+QUERIES_HEADER = 'X-Bench-Queries'
+
+
+class TestClientSession:
+    """Requests through django.test.Client, counting queries in this thread"""
+
+    def __init__(self, user=None):
+        from django.test import Client
+
+        self.client = Client()
+        if user is not None:
+            self.client.force_login(user)
+
+    def prepare_login(self):
+        pass
+
+    def request(self, method, path, data=None, form=False):
+        from django.db import connection
+
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            if method == 'GET':
+                response = self.client.get(path)
+            elif form:
+                response = self.client.post(path, data)
+            else:
+                response = self.client.post(path, json.dumps(data or {}), content_type='application/json')
+        return response.status_code, queries
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPSession:
+    """Requests over HTTP with a cookie jar, sending the CSRF token like the dashboard does"""
+
+    def __init__(self, base_url, user=None):
+        self.base_url = base_url
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect)
+        if user is not None:
+            self.prepare_login()
+            status, _ = self.request('POST', '/auth/login/', {'username': user.username, 'password': PASSWORD}, form=True)
+            if status != 302:
+                raise RuntimeError(f'Logging in {user.username} failed with status {status}')
+
+    def prepare_login(self):
+        # The login page sets the CSRF cookie
+        self.request('GET', '/auth/login/')
+
+    def request(self, method, path, data=None, form=False):
+        headers = {}
+        body = None
+        if method != 'GET':
+            token = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), None)
+            if token:
+                headers['X-CSRFToken'] = token
+            if form:
+                body = urllib.parse.urlencode(data or {}).encode()
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            else:
+                body = json.dumps(data or {}).encode()
+                headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            response = self.opener.open(request)
+        except urllib.error.HTTPError as error:
+            response = error
+        with response:
+            response.read()
+            return response.status, int(response.headers.get(QUERIES_HEADER, 0))
+
+
+def counting_application(application):
+    """Wrap a WSGI application to report the queries of each request in a response header"""
+    from django.db import connection
+
+    def counted(environ, start_response):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        def start(status, headers, exc_info=None):
+            return start_response(status, [*headers, (QUERIES_HEADER, str(queries))], exc_info)
+
+        with connection.execute_wrapper(count):
+            return application(environ, start)
+
+    return counted
+
+
+def start_server():
+    """Serve the project on a free local port from a background thread; return (server, base URL)"""
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(counting_application(WSGIHandler()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f'http://{host}:{port}'
+
+
+def scenario_request(name, user, state, rng):
+    """Return (method, path, data, form, expected status) of one request of a scenario"""
+    if name == 'login':
+        return 'POST', '/auth/login/', {'username': user.username, 'password': PASSWORD}, True, 302
+    if name == 'dashboard':
+        return 'GET', '/', None, False, 200
+    if name == 'list':
+        return 'GET', '/api/expenses/', None, False, 200
+    if name == 'detail':
+        return 'GET', f'/api/expenses/{rng.choice(state["ids"])}/', None, False, 200
+    if name == 'create':
+        return 'POST', '/api/expenses/', {
+            'amount': f'{rng.randrange(100, 50000) / 100:.2f}',
+            'description': 'Benchmark',
+            'category': rng.choice(state['categories']),
+            'transaction_type': 'income' if rng.random() < 0.2 else 'expense',
+        }, False, 201
+    if name == 'summary':
+        return 'GET', '/api/summary/', None, False, 200
+    if name == 'reset':
+        return 'POST', '/api/reset/', None, False, 200
+    raise ValueError(name)
+
+
+def worker(name, index, user, options, barrier, results, lock):
+    from django.db import connection
+
+    from expenses.models import Expense
+
+    rng = random.Random(f'{options.seed}-{name}-{index}')
+    state = {
+        'ids': list(Expense.objects.filter(user=user).order_by('id').values_list('id', flat=True)[:1000]),
+        'categories': [value for value, _ in Expense.CATEGORY_CHOICES],
+    }
+    make_session = options.make_session
+    session = None if name == 'login' else make_session(user)
+
+    def one_request():
+        nonlocal session
+        if name == 'login':
+            session = make_session(None)
+            session.prepare_login()
+        elif name == 'reset':
+            seed_expenses([user], options.reset_rows, seed=rng.randrange(2 ** 32))
+        method, path, data, form, expected = scenario_request(name, user, state, rng)
+        start = time.perf_counter()
+        status, count = session.request(method, path, data, form=form)
+        return time.perf_counter() - start, count, status != expected
+
+    latencies = []
+    queries = []
+    errors = 0
+    try:
+        for _ in range(options.warmup):
+            one_request()
+        barrier.wait()
+        for _ in range(options.requests):
+            elapsed, count, failed = one_request()
+            latencies.append(elapsed)
+            queries.append(count)
+            errors += failed
+    except Exception:
+        barrier.abort()
+        raise
+    finally:
+        connection.close()
+
+    with lock:
+        results['latencies'].extend(latencies)
+        results['queries'].extend(queries)
+        results['errors'] += errors
+
+
+def run_scenario(name, users, options):
+    from budget_tracker.instrumentation import percentile
+
+    barrier = threading.Barrier(options.threads + 1)
+    results = {'latencies': [], 'queries': [], 'errors': 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(name, i, users[i % len(users)], options, barrier, results, lock))
+        for i in range(options.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(results['latencies'])
+    requests = len(latencies)
+    return {
+        'requests': requests,
+        'errors': results['errors'],
+        'throughput': round(requests / elapsed, 2),
+        'mean_ms': round(sum(latencies) / requests * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries_per_request': round(sum(results['queries']) / requests, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return (scenario, metric, baseline value, current value) for every regression"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append((name, 'p95_ms', base['p95_ms'], current['p95_ms']))
+        if current['throughput'] < base['throughput'] / (1 + tolerance):
+            regressions.append((name, 'throughput', base['throughput'], current['throughput']))
+        if current['queries_per_request'] > base['queries_per_request'] + 0.01:
+            regressions.append((name, 'queries_per_request', base['queries_per_request'],
+                                current['queries_per_request']))
+        if current['errors'] > base['errors']:
+            regressions.append((name, 'errors', base['errors'], current['errors']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--transactions', type=int, default=2000, help='transactions per user')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threads', type=int, default=1, help='concurrent workers')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per worker and scenario')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per worker and scenario')
+    parser.add_argument('--reset-rows', type=int, default=200, help='rows seeded before every reset request')
+    parser.add_argument('--scenario', choices=SCENARIOS, action='append', help='only run this scenario (can be repeated)')
+    parser.add_argument('--server', action='store_true', help='send HTTP requests to a local threaded WSGI server')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown of p95 and throughput against the baseline (default: 0.2)')
+    options = parser.parse_args()
+
+    setup_django()
+    migrate()
+
+    import django
+    from django.conf import settings
+    from django.db import connection
+
+    from expenses.services import rebuild_rollups
+
+    # Measure the production code paths: no query log, and password hashing
+    # would dominate the login timings
+    settings.DEBUG = False
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    logging.disable(logging.INFO)
+
+    users = create_users(options.users)
+    for user in users:
+        user.set_password(PASSWORD)
+        user.save(update_fields=['password'])
+    seed_expenses(users, options.transactions, seed=options.seed)
+    rebuild_rollups()
+
+    server = None
+    if options.server:
+        server, base_url = start_server()
+        options.make_session = lambda user: HTTPSession(base_url, user)
+    else:
+        options.make_session = TestClientSession
+
+    results = {
+        'config': {
+            'users': options.users,
+            'transactions': options.transactions,
+            'seed': options.seed,
+            'threads': options.threads,
+            'requests': options.requests,
+            'reset_rows': options.reset_rows,
+            'mode': 'server' if options.server else 'client',
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': f'{connection.vendor} {connection.Database.sqlite_version}'
+            if connection.vendor == 'sqlite' else connection.vendor,
+        },
+        'scenarios': {},
+    }
+    print(f"{'scenario':<10} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for name in options.scenario or SCENARIOS:
+        result = results['scenarios'][name] = run_scenario(name, users, options)
+        print(f"{name:<10} {result['requests']:>9} {result['errors']:>7} {result['throughput']:>8.0f} "
+              f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['queries_per_request']:>8.2f}")
+    if server is not None:
+        server.shutdown()
+
+    with open(options.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'Results written to {options.output}')
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get('config') != results['config']:
+            print(f"Warning: the baseline was run with {baseline.get('config')}")
+        regressions = compare(results, baseline, options.tolerance)
+        for name, metric, before, after in regressions:
+            print(f'REGRESSION {name} {metric}: {before} -> {after}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against {options.baseline}')
+
+
+if __name__ == '__main__':
+    main()
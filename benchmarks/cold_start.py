@@ -0,0 +1,114 @@
+"""
+Cold-start cost of the WSGI entry point, the way a fresh Vercel lambda pays it.
+
+    python -m benchmarks.cold_start --runs 5
+
+Every run is a new interpreter with VERCEL=1 and an SQLite database path that
+starts out in one of these states:
+
+- empty: no database file and no snapshot (migrate + create the admin user)
+- snapshot: no database file, but a prebuilt snapshot to copy
+  (COLD_START_SNAPSHOT, built with `manage.py build_db_snapshot`)
+- warm: the database file from an earlier run is still there
+
+For each state the script reports the time to import budget_tracker.wsgi
+(Django setup plus database bootstrap) and to serve the first request, plus
+whether the admin modules were imported before that request.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+from budget_tracker.wsgi import application
+imported = time.perf_counter()
+loaded = {name: name in sys.modules for name in ('expenses.admin',)}
+
+def start_response(status, headers):
+    start_response.status = status
+
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': 'bench.vercel.app',
+    'SERVER_PORT': '443', 'HTTP_HOST': 'bench.vercel.app', 'wsgi.url_scheme': 'https', 'wsgi.input': sys.stdin.buffer,
+    'wsgi.errors': sys.stderr, 'wsgi.version': (1, 0), 'wsgi.multithread': False, 'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+}
+b''.join(application(environ, start_response))
+done = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_response_ms': (done - imported) * 1000,
+    'status': start_response.status,
+    **loaded,
+}))
+'''
+
+
+def run_child(database, snapshot, path):
+    env = dict(os.environ, VERCEL='1', DATABASE_URL=f'sqlite:///{database}', DEBUG='False')
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+    if snapshot:
+        env['COLD_START_SNAPSHOT'] = snapshot
+    else:
+        env['COLD_START_SNAPSHOT'] = os.path.join(os.path.dirname(database), 'missing.sqlite3')
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, path], env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def build_snapshot(directory):
+    snapshot = os.path.join(directory, 'snapshot.sqlite3')
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{snapshot}')
+    subprocess.run([sys.executable, 'manage.py', 'build_db_snapshot', snapshot], env=env, check=True,
+                   capture_output=True)
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='cold starts per state; medians are reported')
+    parser.add_argument('--path', default='/auth/login/', help='URL of the first request')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='budget-bench-')
+    snapshot = build_snapshot(directory)
+    database = os.path.join(directory, 'db.sqlite3')
+
+    def remove_database():
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+
+    states = {
+        'empty': (True, None),
+        'snapshot': (True, snapshot),
+        'warm': (False, snapshot),
+    }
+
+    print(f"{'state':<10} {'import ms':>10} {'first response ms':>18} {'total ms':>9} {'status':>8} "
+          f"{'admin loaded':>13}")
+    for name, (fresh, state_snapshot) in states.items():
+        results = []
+        for _ in range(args.runs):
+            if fresh:
+                remove_database()
+            results.append(run_child(database, state_snapshot, args.path))
+        import_ms = statistics.median(result['import_ms'] for result in results)
+        response_ms = statistics.median(result['first_response_ms'] for result in results)
+        last = results[-1]
+        print(f"{name:<10} {import_ms:>10.0f} {response_ms:>18.0f} {import_ms + response_ms:>9.0f} "
+              f"{last['status'].split()[0]:>8} {str(last['expenses.admin']):>13}")
+
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
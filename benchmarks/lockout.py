@@ -0,0 +1,157 @@
+"""
+Concurrent brute-force simulation against the login lockout.
+
+    python -m benchmarks.lockout --threads 8 --attempts 200
+
+Counting: every thread records --attempts failures for the same user, with the
+lockout threshold out of reach so every failure must be counted.
+
+- legacy: the old read-modify-save (get_or_create, += 1, save())
+- atomic: UserLoginAttempt.record_failure, a single UPDATE
+
+"lost" is how many increments the final count is short by. "writes" counts
+the INSERT/UPDATE statements against authentication_userloginattempt.
+
+Login view: the same threads POST wrong passwords for one user through
+/auth/login/ with the default threshold. Then every thread logs its own
+unlocked user in successfully, which should write nothing to the lockout
+table.
+"""
+import argparse
+import threading
+import time
+
+from benchmarks import create_users, migrate, setup_django
+
+TABLE = 'authentication_userloginattempt'
+
+
+def legacy_failure(user_id):
+    from authentication.models import UserLoginAttempt
+
+    attempt, _ = UserLoginAttempt.objects.get_or_create(user_id=user_id)
+    attempt.failed_attempts += 1
+    attempt.save()
+
+
+def atomic_failure(user_id):
+    from authentication.models import UserLoginAttempt
+
+    UserLoginAttempt.record_failure(user_id)
+
+
+def run_threads(threads, target):
+    """Run target(index, count_writes) in `threads` threads; return (seconds, writes, errors)"""
+    from django.db import OperationalError, connection
+
+    totals = {'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        writes = errors = 0
+
+        def count_writes(execute, sql, params, many, context):
+            nonlocal writes
+            if TABLE in sql and sql.startswith(('INSERT', 'UPDATE')):
+                writes += 1
+            return execute(sql, params, many, context)
+
+        try:
+            with connection.execute_wrapper(count_writes):
+                barrier.wait()
+                try:
+                    target(index)
+                except OperationalError:
+                    errors += 1
+        finally:
+            connection.close()
+        with lock:
+            totals['writes'] += writes
+            totals['errors'] += errors
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, totals['writes'], totals['errors']
+
+
+def counting(threads, attempts):
+    from django.test.utils import override_settings
+
+    from authentication.models import UserLoginAttempt
+
+    print(f"{'strategy':<9} {'expected':>9} {'counted':>8} {'lost':>6} {'writes':>7} {'errors':>7} {'attempts/s':>11}")
+    for name, record in (('legacy', legacy_failure), ('atomic', atomic_failure)):
+        user = create_users(1, prefix=f'lockout_{name}')[0]
+        UserLoginAttempt.objects.filter(user=user).delete()
+
+        def target(index):
+            for _ in range(attempts):
+                record(user.pk)
+
+        with override_settings(ACCOUNT_LOCKOUT_ATTEMPTS=10 ** 9):
+            seconds, writes, errors = run_threads(threads, target)
+        expected = threads * attempts
+        counted = UserLoginAttempt.objects.get(user=user).failed_attempts
+        print(f'{name:<9} {expected:>9} {counted:>8} {expected - counted:>6} {writes:>7} {errors:>7} '
+              f'{expected / seconds:>11.0f}')
+
+
+def login_view(threads, attempts):
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    from authentication.models import UserLoginAttempt
+
+    target_user = User.objects.create_user(username='lockout_target', password='Secret123!')
+
+    def brute_force(index):
+        client = Client()
+        for _ in range(attempts):
+            client.post('/auth/login/', {'username': 'lockout_target', 'password': 'wrong'})
+
+    seconds, writes, errors = run_threads(threads, brute_force)
+    failed = UserLoginAttempt.objects.get(user=target_user).failed_attempts
+    print(f'brute force: {threads * attempts} wrong passwords in {seconds:.2f}s, {writes} lockout writes, '
+          f'{errors} errors; counted {failed} before locking (threshold {settings.ACCOUNT_LOCKOUT_ATTEMPTS})')
+
+    users = [User.objects.create_user(username=f'lockout_ok_{i}', password='Secret123!') for i in range(threads)]
+
+    def log_in(index):
+        client = Client()
+        for _ in range(attempts):
+            client.post('/auth/login/', {'username': users[index].username, 'password': 'Secret123!'})
+            client.logout()
+
+    seconds, writes, errors = run_threads(threads, log_in)
+    print(f'successful logins: {threads * attempts} in {seconds:.2f}s, {writes} lockout writes, {errors} errors')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--attempts', type=int, default=200, help='attempts per thread')
+    args = parser.parse_args()
+
+    setup_django()
+    migrate()
+
+    from django.conf import settings
+
+    # Password hashing would dominate the timings; the lockout bookkeeping is what is measured
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+    counting(args.threads, args.attempts)
+    print()
+    login_view(args.threads, max(1, args.attempts // 10))
+
+
+if __name__ == '__main__':
+    main()
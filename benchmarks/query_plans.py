@@ -0,0 +1,133 @@
+"""
+Show the SQLite query plans of the hot expense endpoints with and without the
+composite indexes declared in Expense.Meta.indexes.
+
+    python -m benchmarks.query_plans --rows 1000000 --users 10
+
+The database is seeded with those indexes dropped (implicit FK index only),
+every query issued by the list, summary and detail endpoints is captured and
+run through EXPLAIN QUERY PLAN, then the indexes are built and the same
+requests repeated. A plan line containing "USE TEMP B-TREE" means SQLite had to
+sort the result.
+
+The summary reads the monthly rollup table rather than the expenses, so its
+plan is the same in both runs: it shows the rollup query, which stays a
+(user_id, ...) index search however many expenses there are.
+"""
+import argparse
+import time
+
+from benchmarks import create_users, migrate, seed_expenses, setup_django
+
+# Queries on other tables (sessions, users, data versions) are not shown
+TABLES = ('expenses_expense', 'expenses_monthlyrollup')
+
+
+def capture_endpoint_queries(user, expense_id, repeat):
+    """Call each endpoint as `user` and return {endpoint: (avg_ms, [sql, ...])}"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from expenses import views
+
+    factory = APIRequestFactory()
+
+    def get(view, path, **kwargs):
+        def call():
+            request = factory.get(path)
+            force_authenticate(request, user=user)
+            view(request, **kwargs).render()
+        return call
+
+    endpoints = {
+        'list': get(views.ExpenseListCreateAPIView.as_view(), '/api/expenses/'),
+        # The summary endpoint caches its response per data version, so repeats would show
+        # no queries; summarize() is the monthly rollup query behind it
+        'summary': lambda: views.summarize(user),
+        'detail': get(views.ExpenseRetrieveUpdateDestroyAPIView.as_view(), f'/api/expenses/{expense_id}/',
+                      pk=expense_id),
+    }
+
+    results = {}
+    for name, call in endpoints.items():
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (sum(timings) / len(timings), [query['sql'] for query in queries.captured_queries])
+    return results
+
+
+def explain(sql):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def report(title, results):
+    print(f'\n=== {title} ===')
+    for name, (avg_ms, queries) in results.items():
+        print(f'\n[{name}] {avg_ms:.2f} ms/request')
+        for sql in queries:
+            if not any(table in sql for table in TABLES):
+                continue
+            print(f'  {sql[:110]}...' if len(sql) > 110 else f'  {sql}')
+            for line in explain(sql):
+                marker = '  <-- sort' if 'TEMP B-TREE' in line else ''
+                print(f'      {line}{marker}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='total expense rows to seed')
+    parser.add_argument('--users', type=int, default=10, help='number of users sharing the rows')
+    parser.add_argument('--repeat', type=int, default=5, help='requests per endpoint when timing')
+    args = parser.parse_args()
+
+    database = setup_django()
+    print(f'Scratch database: {database}')
+
+    migrate()
+
+    from django.db import connection
+    from expenses.models import Expense
+
+    with connection.schema_editor() as schema_editor:
+        for index in Expense._meta.indexes:
+            schema_editor.remove_index(Expense, index)
+
+    users = create_users(args.users)
+
+    start = time.perf_counter()
+    seed_expenses(users, args.rows // args.users)
+    # seed_expenses skips the write hooks; the summary reads the rollups
+    from expenses.services import rebuild_rollups
+    rebuild_rollups()
+    print(f'Seeded {args.rows} rows in {time.perf_counter() - start:.1f}s')
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    user = users[0]
+    expense_id = Expense.objects.filter(user=user).values_list('id', flat=True).first()
+
+    report('Before: implicit user_id index only', capture_endpoint_queries(user, expense_id, args.repeat))
+
+    start = time.perf_counter()
+    with connection.schema_editor() as schema_editor:
+        for index in Expense._meta.indexes:
+            schema_editor.add_index(Expense, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f'\nBuilt composite indexes in {time.perf_counter() - start:.1f}s')
+
+    report('After: composite indexes', capture_endpoint_queries(user, expense_id, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Resetting a large account: the old single delete() against the batched reset.
+
+    python -m benchmarks.reset --rows 1000000 --batch-size 5000
+
+Each strategy gets a fresh copy of a database holding one account with
+--rows expenses plus a few small accounts. While the reset runs, a second
+thread keeps creating expenses for another user, the way other requests
+would; its worst write latency and "database is locked" failures show how
+long the reset blocks everyone else.
+
+- single: Expense.objects.filter(user=user).delete() in one transaction (the
+  old reset: the delete collector loads every primary key first)
+- batched: services.delete_user_expenses, one short transaction per batch
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from decimal import Decimal
+
+from benchmarks import create_users, migrate, seed_expenses, setup_django
+
+
+def single_reset(user, batch_size):
+    from django.db import transaction
+
+    from expenses import services
+    from expenses.models import Expense
+
+    with transaction.atomic():
+        deleted = Expense.objects.filter(user=user).delete()[0]
+        services.user_data_reset(user)
+    return deleted
+
+
+def batched_reset(user, batch_size):
+    from django.db import transaction
+
+    from expenses import services
+
+    deleted = services.delete_user_expenses(user, batch_size=batch_size)
+    with transaction.atomic():
+        services.user_data_reset(user)
+    return deleted
+
+
+def writer(user_id, stop, results):
+    from django.db import OperationalError, connection, transaction
+
+    from expenses import services
+    from expenses.models import Expense
+
+    latencies = []
+    locked = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                expense = Expense.objects.create(
+                    user_id=user_id, amount=Decimal('1.00'), description='Concurrent',
+                    category='food', transaction_type='expense',
+                )
+                services.expense_created(expense)
+            latencies.append(time.perf_counter() - start)
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+        time.sleep(0.005)
+    connection.close()
+    results.update(latencies=latencies, locked=locked)
+
+
+def run(strategy, user, other, batch_size):
+    from django.db import connection
+
+    stop = threading.Event()
+    results = {}
+    thread = threading.Thread(target=writer, args=(other.id, stop, results))
+    thread.start()
+    time.sleep(0.2)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    deleted = strategy(user, batch_size)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    stop.set()
+    thread.join()
+    connection.close()
+    latencies = sorted(results['latencies']) or [0]
+    return {
+        'deleted': deleted,
+        'seconds': elapsed,
+        'peak_mb': peak / 1024 / 1024,
+        'writes': len(results['latencies']),
+        'max_write_ms': latencies[-1] * 1000,
+        'locked': results['locked'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='expenses in the account being reset')
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per transaction for the batched reset')
+    parser.add_argument('--strategy', choices=['single', 'batched'], action='append',
+                        help='only run this strategy (can be repeated)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='budget-bench-')
+    template = os.path.join(directory, 'template.sqlite3')
+    database = setup_django(os.path.join(directory, 'bench.sqlite3'))
+
+    from django.db import connection
+
+    from expenses.services import rebuild_rollups
+
+    # Build the seeded database once and copy it for every strategy
+    migrate()
+    users = create_users(5)
+    seed_expenses(users[:1], args.rows)
+    seed_expenses(users[1:], 1000, seed=1)
+    rebuild_rollups()
+    connection.close()
+    shutil.copyfile(database, template)
+
+    strategies = {'single': single_reset, 'batched': batched_reset}
+    print(f"{'strategy':<9} {'deleted':>9} {'seconds':>8} {'peak MB':>8} "
+          f"{'other writes':>13} {'max write ms':>13} {'locked':>7}")
+    for name in args.strategy or strategies:
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+        shutil.copyfile(template, database)
+        result = run(strategies[name], users[0], users[1], args.batch_size)
+        print(f"{name:<9} {result['deleted']:>9} {result['seconds']:>8.2f} {result['peak_mb']:>8.1f} "
+              f"{result['writes']:>13} {result['max_write_ms']:>13.0f} {result['locked']:>7}")
+
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
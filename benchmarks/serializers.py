@@ -0,0 +1,64 @@
+"""
+Compare rows/second of ExpenseSerializer against the ExpenseRowSerializer fast path.
+
+    python -m benchmarks.serializers --sizes 1000 10000 100000
+
+Each size is timed end to end the way the list view does it: fetch the rows,
+turn them into primitives and render JSON.
+"""
+import argparse
+import time
+
+from benchmarks import create_users, migrate, seed_expenses, setup_django
+
+
+def time_it(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3, help='runs per size; the best run is reported')
+    args = parser.parse_args()
+
+    setup_django()
+    migrate()
+
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory
+
+    from expenses.models import Expense
+    from expenses.serializers import ExpenseRowSerializer, ExpenseSerializer
+
+    user = create_users(1)[0]
+    seed_expenses([user], max(args.sizes))
+
+    request = APIRequestFactory().get('/api/expenses/')
+    request.user = user
+    renderer = JSONRenderer()
+    ordered = Expense.objects.filter(user=user).order_by('-date_created', '-id')
+
+    print(f"{'rows':>8} {'ExpenseSerializer':>20} {'ExpenseRowSerializer':>22} {'speedup':>8}")
+    for size in args.sizes:
+        def model_path():
+            rows = ordered[:size]
+            renderer.render(ExpenseSerializer(rows, many=True, context={'request': request}).data)
+
+        def fast_path():
+            rows = ordered.values_list(*ExpenseRowSerializer.columns, named=True)[:size]
+            renderer.render(ExpenseRowSerializer(username=user.username).many(rows))
+
+        slow = time_it(model_path, args.repeat)
+        fast = time_it(fast_path, args.repeat)
+        print(f'{size:>8} {size / slow:>15,.0f} r/s {size / fast:>17,.0f} r/s {slow / fast:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
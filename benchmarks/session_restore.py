@@ -0,0 +1,110 @@
+"""
+Measure the per-request cost of VercelSessionPersistenceMiddleware.
+
+    python -m benchmarks.session_restore --requests 2000
+
+Requests run through SessionMiddleware, AuthenticationMiddleware and the
+session persistence middleware into a view that checks request.user, the way
+every dashboard and API view does. Each scenario is timed with and without the
+persistence middleware, and the queries per request are counted:
+
+- anonymous: no cookies at all
+- authenticated: a valid database session
+- restorable: the session store lost the session, the browser still has the
+  signed restore cookie (every request starts from a fresh session, so the
+  restore path runs each time)
+"""
+import argparse
+import time
+
+from benchmarks import create_users, migrate, setup_django
+
+
+def build_handler(with_persistence):
+    from django.contrib.auth.middleware import AuthenticationMiddleware
+    from django.contrib.sessions.middleware import SessionMiddleware
+    from django.http import HttpResponse
+
+    from authentication.middleware import VercelSessionPersistenceMiddleware
+
+    def view(request):
+        return HttpResponse('ok' if request.user.is_authenticated else 'anonymous')
+
+    handler = view
+    if with_persistence:
+        handler = VercelSessionPersistenceMiddleware(handler)
+    return SessionMiddleware(AuthenticationMiddleware(handler))
+
+
+def build_requests(user):
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+
+    from authentication.middleware import RESTORE_COOKIE_NAME, set_restore_cookie
+
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+
+    user.backend = settings.AUTHENTICATION_BACKENDS[0]
+    token = set_restore_cookie(HttpResponse(), user).cookies[RESTORE_COOKIE_NAME].value
+
+    factory = RequestFactory()
+    cookies = {
+        'anonymous': {},
+        'authenticated': {settings.SESSION_COOKIE_NAME: session.session_key},
+        'restorable': {RESTORE_COOKIE_NAME: token},
+    }
+
+    def make(name):
+        request = factory.get('/api/summary/')
+        request.COOKIES.update(cookies[name])
+        return request
+
+    return {name: (lambda name=name: make(name)) for name in cookies}
+
+
+def run(handler, make_request, count):
+    from django.db import connection
+
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_queries):
+        start = time.perf_counter()
+        for _ in range(count):
+            handler(make_request())
+        elapsed = time.perf_counter() - start
+    return elapsed / count * 1e6, queries / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per scenario')
+    args = parser.parse_args()
+
+    setup_django()
+    migrate()
+
+    user = create_users(1)[0]
+    requests = build_requests(user)
+    handlers = {False: build_handler(False), True: build_handler(True)}
+
+    print(f"{'scenario':<15} {'without':>12} {'with':>12} {'overhead':>10} {'queries':>9}")
+    for name, make_request in requests.items():
+        base_us, _ = run(handlers[False], make_request, args.requests)
+        full_us, queries = run(handlers[True], make_request, args.requests)
+        print(f'{name:<15} {base_us:>9.1f} us {full_us:>9.1f} us {full_us - base_us:>7.1f} us {queries:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Concurrent read-heavy load test comparing session configurations.
+
+    python -m benchmarks.sessions --threads 8 --requests 200
+
+Every thread logs in its own user and then hammers GET /api/summary/ through
+the full middleware stack. For each configuration the script reports how many
+INSERT/UPDATE/DELETE statements hit django_session, throughput and latency
+percentiles:
+
+- every_request: SESSION_SAVE_EVERY_REQUEST = True (the old behaviour)
+- refresh: database sessions saved by SessionRefreshMiddleware
+- cached_db: the same, with reads served from the cache
+- signed_cookies: no server-side session storage
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks import create_users, migrate, setup_django
+
+REFRESH_MIDDLEWARE = 'authentication.middleware.SessionRefreshMiddleware'
+
+
+def configurations(settings):
+    without_refresh = [name for name in settings.MIDDLEWARE if name != REFRESH_MIDDLEWARE]
+    return {
+        'every_request': {
+            'SESSION_SAVE_EVERY_REQUEST': True,
+            'MIDDLEWARE': without_refresh,
+            'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        },
+        'refresh': {'SESSION_ENGINE': 'django.contrib.sessions.backends.db'},
+        'cached_db': {'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db'},
+        'signed_cookies': {'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies'},
+    }
+
+
+def worker(user, requests, barrier, latencies, counters, lock):
+    from django.db import connection
+    from django.test import Client
+
+    session_writes = 0
+    errors = 0
+
+    def count_writes(execute, sql, params, many, context):
+        nonlocal session_writes
+        if 'django_session' in sql and not sql.startswith('SELECT'):
+            session_writes += 1
+        return execute(sql, params, many, context)
+
+    client = Client()
+    client.force_login(user)
+    timings = []
+    try:
+        with connection.execute_wrapper(count_writes):
+            barrier.wait()
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = client.get('/api/summary/')
+                timings.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+    finally:
+        connection.close()
+
+    with lock:
+        latencies.extend(timings)
+        counters['session_writes'] += session_writes
+        counters['errors'] += errors
+
+
+def run(users, requests):
+    barrier = threading.Barrier(len(users) + 1)
+    latencies = []
+    counters = {'session_writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(user, requests, barrier, latencies, counters, lock))
+        for user in users
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return {
+        'requests': len(latencies),
+        'session_writes': counters['session_writes'],
+        'errors': counters['errors'],
+        'throughput': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help='concurrent clients, one user each')
+    parser.add_argument('--requests', type=int, default=200, help='requests per client')
+    args = parser.parse_args()
+
+    setup_django()
+    migrate()
+
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    users = create_users(args.threads)
+
+    print(f"{'configuration':<16} {'requests':>9} {'session writes':>15} {'errors':>7} "
+          f"{'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, overrides in configurations(settings).items():
+        with override_settings(**overrides):
+            result = run(users, args.requests)
+        print(f"{name:<16} {result['requests']:>9} {result['session_writes']:>15} {result['errors']:>7} "
+              f"{result['throughput']:>8.0f} {result['p50']:>8.2f} {result['p95']:>8.2f} {result['p99']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Multi-threaded write/read throughput of the stock SQLite backend against the
+tuned budget_tracker.db.sqlite3 backend (WAL, synchronous=NORMAL, mmap,
+cache_size, temp_store=MEMORY, BEGIN IMMEDIATE).
+
+    python -m benchmarks.sqlite_tuning --writers 4 --readers 4 --seconds 5
+
+Writers run the API's write pattern: a transaction that reads, then inserts.
+Readers run the per-user aggregate a summary recomputation does. Each backend
+gets its own scratch database file; "locked" counts operations that failed
+with "database is locked".
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from benchmarks import setup_django
+
+
+def configure(directory):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'budget_tracker.settings')
+    from django.conf import settings
+
+    settings.DATABASES['stock'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(directory, 'stock.sqlite3'),
+        'OPTIONS': {'timeout': settings.SQLITE_OPTIONS['timeout']},
+    }
+    settings.DATABASES['tuned'] = {
+        'ENGINE': 'budget_tracker.db.sqlite3',
+        'NAME': os.path.join(directory, 'tuned.sqlite3'),
+        'OPTIONS': settings.SQLITE_OPTIONS,
+    }
+
+
+def prepare(alias, users, rows):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+
+    from expenses.models import Expense
+
+    call_command('migrate', database=alias, verbosity=0, interactive=False)
+    User.objects.using(alias).bulk_create([User(username=f'bench_user_{i}', password='!') for i in range(users)])
+    user_ids = list(User.objects.using(alias).values_list('id', flat=True))
+    rng = random.Random(0)
+    Expense.objects.using(alias).bulk_create(
+        (
+            Expense(user_id=rng.choice(user_ids), amount=Decimal(rng.randrange(100, 100000)) / 100,
+                    description='Seed', category='food', transaction_type='expense')
+            for _ in range(rows)
+        ),
+        batch_size=5000,
+    )
+    return user_ids
+
+
+def writer(alias, user_ids, deadline, results):
+    from django.db import OperationalError, connections, transaction
+
+    from expenses.models import Expense
+
+    rng = random.Random()
+    done = locked = 0
+    while time.perf_counter() < deadline:
+        user_id = rng.choice(user_ids)
+        try:
+            with transaction.atomic(using=alias):
+                Expense.objects.using(alias).filter(user_id=user_id).count()
+                Expense.objects.using(alias).create(
+                    user_id=user_id, amount=Decimal('12.34'), description='Write',
+                    category='food', transaction_type='expense',
+                )
+            done += 1
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+    connections[alias].close()
+    results.append(('write', done, locked))
+
+
+def reader(alias, user_ids, deadline, results):
+    from django.db import OperationalError, connections
+    from django.db.models import Sum
+
+    from expenses.models import Expense
+
+    rng = random.Random()
+    done = locked = 0
+    while time.perf_counter() < deadline:
+        try:
+            Expense.objects.using(alias).filter(user_id=rng.choice(user_ids)).aggregate(Sum('amount'))
+            done += 1
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+    connections[alias].close()
+    results.append(('read', done, locked))
+
+
+def run(alias, user_ids, writers, readers, seconds):
+    results = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=writer, args=(alias, user_ids, deadline, results)) for _ in range(writers)]
+    threads += [threading.Thread(target=reader, args=(alias, user_ids, deadline, results)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    totals = {'write': [0, 0], 'read': [0, 0]}
+    for kind, done, locked in results:
+        totals[kind][0] += done
+        totals[kind][1] += locked
+    return {kind: (done / seconds, locked) for kind, (done, locked) in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5, help='duration of each run')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=100000, help='expenses seeded before the run')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='budget-bench-')
+    configure(directory)
+    setup_django(os.path.join(directory, 'default.sqlite3'))
+
+    print(f"{'backend':<8} {'writes/s':>10} {'locked':>8} {'reads/s':>10} {'locked':>8}")
+    for alias in ('stock', 'tuned'):
+        user_ids = prepare(alias, args.users, args.rows)
+        result = run(alias, user_ids, args.writers, args.readers, args.seconds)
+        (writes, write_locked), (reads, read_locked) = result['write'], result['read']
+        print(f'{alias:<8} {writes:>10.0f} {write_locked:>8} {reads:>10.0f} {read_locked:>8}')
+
+
+if __name__ == '__main__':
+    main()
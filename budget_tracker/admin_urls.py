@@ -0,0 +1,12 @@
+"""
+Admin URLs, imported the first time a URL under /admin/ is resolved or reversed.
+
+INSTALLED_APPS uses SimpleAdminConfig, so the admin modules of the apps are
+not imported during setup; they are discovered here instead, keeping them off
+the cold-start path of the dashboard and the API.
+"""
+from django.contrib import admin
+
+admin.autodiscover()
+
+urlpatterns, app_name, namespace = admin.site.urls
@@ -0,0 +1,96 @@
+"""
+PostgreSQL backend with optional psycopg connection pooling.
+
+Use it as the ENGINE 'budget_tracker.db.postgresql' (parse_database_url does
+this for postgres:// URLs). Without OPTIONS['pool'] it behaves exactly like
+Django's backend, so CONN_MAX_AGE and CONN_HEALTH_CHECKS give persistent,
+health-checked connections. With OPTIONS['pool'] set to True or to keyword
+arguments for psycopg_pool.ConnectionPool (min_size, max_size, timeout, ...),
+connections are borrowed from a per-process pool when Django opens one and
+handed back when Django closes it at the end of the request.
+
+Pooling needs psycopg 3 and psycopg_pool: pip install "psycopg[binary,pool]".
+"""
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _connection_pools = {}
+    _connection_pools_lock = threading.Lock()
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    @property
+    def pool(self):
+        pool_options = self.settings_dict['OPTIONS'].get('pool')
+        if not pool_options:
+            return None
+        if self.alias not in self._connection_pools:
+            self._create_pool(pool_options)
+        return self._connection_pools[self.alias]
+
+    def _create_pool(self, pool_options):
+        if not is_psycopg3:
+            raise ImproperlyConfigured('Connection pooling requires psycopg 3 (pip install "psycopg[pool]").')
+        if self.settings_dict['CONN_MAX_AGE']:
+            raise ImproperlyConfigured('Pooled connections go back to the pool after each request; set CONN_MAX_AGE to 0.')
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError as exc:
+            raise ImproperlyConfigured('Connection pooling requires psycopg_pool (pip install "psycopg[pool]").') from exc
+
+        with self._connection_pools_lock:
+            if self.alias in self._connection_pools:
+                return
+            connect_kwargs = self.get_connection_params()
+            # Django switches autocommit itself once it has the connection
+            connect_kwargs['autocommit'] = True
+            pool = ConnectionPool(
+                kwargs=connect_kwargs,
+                open=False,
+                configure=self._configure_pooled_connection,
+                check=ConnectionPool.check_connection if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+                **({} if pool_options is True else pool_options),
+            )
+            pool.open()
+            self._connection_pools[self.alias] = pool
+
+    def _configure_pooled_connection(self, connection):
+        """What Django's get_new_connection() does after connecting, once per pooled connection"""
+        options = self.settings_dict['OPTIONS']
+        if 'isolation_level' in options:
+            connection.isolation_level = IsolationLevel(options['isolation_level'])
+        connection.cursor_factory = (
+            base.ServerBindingCursor if options.get('server_side_binding') is True else base.Cursor
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = IsolationLevel(isolation_level) if isolation_level is not None else IsolationLevel.READ_COMMITTED
+        return pool.getconn()
+
+    def _close(self):
+        pool = self.pool
+        if self.connection is None or pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+
+    @classmethod
+    def close_pools(cls):
+        """Close every pool in this process (e.g. before forking workers)"""
+        with cls._connection_pools_lock:
+            for pool in cls._connection_pools.values():
+                pool.close()
+            cls._connection_pools.clear()
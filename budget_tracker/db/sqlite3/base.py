@@ -0,0 +1,69 @@
+"""
+SQLite backend tuned for concurrent web traffic.
+
+Use it as the ENGINE 'budget_tracker.db.sqlite3'. Two keys are added to
+OPTIONS on top of the stock backend:
+
+- pragmas: {name: value} applied to every new connection, e.g.
+  {'journal_mode': 'WAL', 'synchronous': 'NORMAL'}. Only the names in
+  PRAGMAS are accepted, and each value must be one of its keywords or an
+  integer, since PRAGMA takes no bound parameters and the values come from
+  environment variables.
+- transaction_mode: DEFERRED (SQLite's default), IMMEDIATE or EXCLUSIVE,
+  used for the BEGIN that opens every atomic() block. IMMEDIATE takes the
+  write lock up front, so a transaction that reads and then writes waits on
+  the busy timeout instead of failing with "database is locked" when it tries
+  to upgrade its lock.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+# Allowed values per pragma: a tuple of keywords, or int for numeric pragmas
+PRAGMAS = {
+    'journal_mode': ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'),
+    'synchronous': ('OFF', 'NORMAL', 'FULL', 'EXTRA'),
+    'temp_store': ('DEFAULT', 'FILE', 'MEMORY'),
+    'mmap_size': int,
+    'cache_size': int,
+    'busy_timeout': int,
+}
+
+
+def clean_pragma(name, value):
+    """Return value as it should appear in PRAGMA name = value, or raise ImproperlyConfigured."""
+    if name not in PRAGMAS:
+        raise ImproperlyConfigured(f"Unsupported pragma {name!r}; expected one of {', '.join(PRAGMAS)}")
+    allowed = PRAGMAS[name]
+    if allowed is int:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ImproperlyConfigured(f'pragma {name} must be an integer, not {value!r}') from None
+    if str(value).upper() not in allowed:
+        raise ImproperlyConfigured(f"pragma {name} must be one of {', '.join(allowed)}, not {value!r}")
+    return str(value).upper()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {
+            name: clean_pragma(name, value) for name, value in kwargs.pop('pragmas', {}).items()
+        }
+        self.transaction_mode = kwargs.pop('transaction_mode', 'DEFERRED').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}, not {self.transaction_mode!r}"
+            )
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,221 @@
+"""
+Per-request performance instrumentation (opt-in, REQUEST_METRICS=true).
+
+RequestMetricsMiddleware times every request and records, under the name of
+the view that handled it, the wall time, the number and total time of the
+database queries, the serialization time and the response size. Each request
+gets a Server-Timing header (shown in the browser's network panel) and one
+JSON log line on the budget_tracker.instrumentation logger, and the samples
+are kept in `registry` for the Prometheus endpoint (expenses.views.request_metrics).
+
+"Serialization" is the rendering of DRF and template responses plus anything
+a view wraps in timed(request, 'serialize'). Streaming responses are measured
+up to the point the response is returned; their body is not counted.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Prometheus metric name, help text and the sample field it is read from
+METRICS = (
+    ('budget_request_duration_seconds', 'Wall time of the request', 'duration'),
+    ('budget_request_db_queries', 'Database queries per request', 'db_queries'),
+    ('budget_request_db_duration_seconds', 'Time spent in database queries', 'db_duration'),
+    ('budget_request_serialize_duration_seconds', 'Time spent serializing the response', 'serialize_duration'),
+    ('budget_response_size_bytes', 'Size of the response body', 'response_bytes'),
+)
+
+
+class RequestSample:
+    """The measurements of one request"""
+
+    __slots__ = ('duration', 'db_queries', 'db_duration', 'serialize_duration', 'response_bytes')
+
+    def __init__(self):
+        self.duration = 0.0
+        self.db_queries = 0
+        self.db_duration = 0.0
+        self.serialize_duration = 0.0
+        self.response_bytes = None
+
+    def count_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_duration += time.perf_counter() - start
+            self.db_queries += 1
+
+
+class MetricsRegistry:
+    """
+    Rolling per-view samples for the quantiles, and running sums and counts.
+
+    Only the last REQUEST_METRICS_WINDOW samples of a view are kept, so the
+    quantiles follow recent traffic; _sum and _count cover the process lifetime,
+    as Prometheus expects. Each worker process has its own registry.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view, sample):
+        with self.lock:
+            entry = self.views.get(view)
+            if entry is None:
+                entry = self.views[view] = {
+                    field: {'window': deque(maxlen=settings.REQUEST_METRICS_WINDOW), 'sum': 0, 'count': 0}
+                    for _, _, field in METRICS
+                }
+            for _, _, field in METRICS:
+                value = getattr(sample, field)
+                if value is None:
+                    continue
+                series = entry[field]
+                series['window'].append(value)
+                series['sum'] += value
+                series['count'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+    def render(self):
+        """The registry in the Prometheus text exposition format"""
+        with self.lock:
+            views = {
+                view: {field: (sorted(series['window']), series['sum'], series['count'])
+                       for field, series in entry.items()}
+                for view, entry in self.views.items()
+            }
+        lines = []
+        for name, help_text, field in METRICS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} summary')
+            for view in sorted(views):
+                window, total, count = views[view][field]
+                label = f'view="{escape_label(view)}"'
+                for quantile in QUANTILES:
+                    lines.append(f'{name}{{{label},quantile="{quantile}"}} {format_value(percentile(window, quantile))}')
+                lines.append(f'{name}_sum{{{label}}} {format_value(total)}')
+                lines.append(f'{name}_count{{{label}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def percentile(values, quantile):
+    """Nearest-rank percentile of sorted values (NaN when there are none)"""
+    if not values:
+        return math.nan
+    return values[max(0, math.ceil(quantile * len(values)) - 1)]
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return 'NaN' if math.isnan(value) else repr(round(value, 6))
+    return str(value)
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class timed:
+    """
+    Add the time spent in the block to the request's serialization time:
+
+        with timed(request, 'serialize'):
+            data = serializer.data
+
+    Does nothing when the middleware is not installed.
+    """
+
+    def __init__(self, request, section):
+        self.sample = getattr(request, '_request_sample', None)
+        self.field = f'{section}_duration'
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.sample is not None:
+            setattr(self.sample, self.field, getattr(self.sample, self.field) + time.perf_counter() - self.start)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure each request, see the module docstring. Put it first in MIDDLEWARE
+    so the time of the other middleware is included.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = request._request_sample = RequestSample()
+        start = time.perf_counter()
+        with connection.execute_wrapper(sample.count_query):
+            response = self.get_response(request)
+        sample.duration = time.perf_counter() - start
+
+        if not response.streaming:
+            sample.response_bytes = len(response.content)
+        elif response.has_header('Content-Length'):
+            sample.response_bytes = int(response['Content-Length'])
+
+        view = view_name(request)
+        registry.record(view, sample)
+        response['Server-Timing'] = server_timing(sample)
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(sample.duration * 1000, 2),
+            'db_queries': sample.db_queries,
+            'db_ms': round(sample.db_duration * 1000, 2),
+            'serialize_ms': round(sample.serialize_duration * 1000, 2),
+            'response_bytes': sample.response_bytes,
+        }))
+        return response
+
+    def process_template_response(self, request, response):
+        # Called right before DRF and template responses are rendered
+        start = time.perf_counter()
+        sample = request._request_sample
+
+        def rendered(response):
+            sample.serialize_duration += time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def server_timing(sample):
+    return ', '.join([
+        f'app;dur={sample.duration * 1000:.1f}',
+        f'db;dur={sample.db_duration * 1000:.1f};desc="{sample.db_queries} queries"',
+        f'serialize;dur={sample.serialize_duration * 1000:.1f}',
+    ])
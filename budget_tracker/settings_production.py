@@ -17,10 +17,12 @@ X_FRAME_OPTIONS = 'DENY'
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 
 # Database configuration for production (using SQLite for simplicity)
-# In a real production environment, you'd want to use PostgreSQL or MySQL
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Set DATABASE_URL to use PostgreSQL instead
+if not DATABASE_URL:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'budget_tracker.db.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': SQLITE_OPTIONS,
+        }
     }
-}
@@ -0,0 +1,91 @@
+"""
+Database bootstrap for cold starts.
+
+A fresh Vercel instance starts with an empty /tmp, so the SQLite database has
+to be created before the first request. Copying a prebuilt snapshot
+(settings.COLD_START_SNAPSHOT) is a file copy; running migrate means loading
+every migration module and building the graph. Whether anything is left to
+apply is decided by comparing the django_migrations table with the migration
+files on disk, so a database that is already up to date never loads the graph.
+"""
+import os
+import pkgutil
+import shutil
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+ADMIN_USERNAME = 'admin'
+ADMIN_EMAIL = 'admin@example.com'
+ADMIN_PASSWORD = 'admin123!@#'
+
+
+def copy_snapshot(using=DEFAULT_DB_ALIAS):
+    """Copy the snapshot over a missing SQLite database file; True if it was copied"""
+    connection = connections[using]
+    snapshot = getattr(settings, 'COLD_START_SNAPSHOT', None)
+    name = str(connection.settings_dict['NAME'])
+    if connection.vendor != 'sqlite' or not snapshot or connection.is_in_memory_db():
+        return False
+    if os.path.exists(name) or not os.path.exists(snapshot):
+        return False
+
+    # Copy next to the target and rename, so a concurrent start never opens a half-written file
+    partial = f'{name}.{os.getpid()}.partial'
+    shutil.copyfile(snapshot, partial)
+    os.replace(partial, name)
+    return True
+
+
+def migration_files():
+    """(app_label, migration_name) for every migration module on disk"""
+    found = set()
+    for app_config in apps.get_app_configs():
+        try:
+            package = import_module(f'{app_config.name}.migrations')
+        except ImportError:
+            continue
+        if not hasattr(package, '__path__'):
+            continue
+        for module in pkgutil.iter_modules(package.__path__):
+            if not module.ispkg and not module.name.startswith(('_', '~')):
+                found.add((app_config.label, module.name))
+    return found
+
+
+def unapplied_migrations(using=DEFAULT_DB_ALIAS):
+    """Migrations on disk that the django_migrations table has no record of"""
+    try:
+        with connections[using].cursor() as cursor:
+            cursor.execute('SELECT app, name FROM django_migrations')
+            applied = set(cursor.fetchall())
+    except DatabaseError:
+        return migration_files()
+    return migration_files() - applied
+
+
+def ensure_database(using=DEFAULT_DB_ALIAS):
+    """Make the database usable: copy the snapshot, then migrate only if something is pending"""
+    copied = copy_snapshot(using)
+    if not unapplied_migrations(using):
+        return 'snapshot' if copied else 'ready'
+
+    from django.core.management import call_command
+
+    call_command('migrate', database=using, interactive=False, verbosity=0)
+    create_admin_user(using)
+    return 'migrated'
+
+
+def create_admin_user(using=DEFAULT_DB_ALIAS):
+    """Create the default admin superuser unless a superuser already exists"""
+    from django.contrib.auth.models import User
+
+    if User.objects.db_manager(using).filter(is_superuser=True).exists():
+        return False
+    User.objects.db_manager(using).create_superuser(
+        username=ADMIN_USERNAME, email=ADMIN_EMAIL, password=ADMIN_PASSWORD,
+    )
+    return True
@@ -14,11 +14,13 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+from django.urls import URLResolver, include, path
+from django.urls.resolvers import RoutePattern
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # The admin URLconf (and with it every admin.py) is only imported once a
+    # request or reverse() needs it, see budget_tracker.admin_urls
+    URLResolver(RoutePattern('admin/'), 'budget_tracker.admin_urls', app_name='admin', namespace='admin'),
     path('auth/', include('authentication.urls')),
     path('', include('expenses.urls')),
 ]
@@ -38,42 +38,13 @@ if os.environ.get('VERCEL'):
                 return
                 
             try:
-                from django.core.management import call_command
-                from django.db import connection
-                import sqlite3
-                
-                # Check if database file exists and has tables
-                db_path = '/tmp/db.sqlite3'
-                needs_setup = True
-                
-                if os.path.exists(db_path):
-                    try:
-                        conn = sqlite3.connect(db_path)
-                        cursor = conn.cursor()
-                        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='expenses_expense';")
-                        if cursor.fetchone():
-                            needs_setup = False
-                        conn.close()
-                    except:
-                        needs_setup = True
-                
-                if needs_setup:
-                    # Run migrations
-                    call_command('migrate', '--noinput', verbosity=0)
-                    
-                    # Create a superuser for admin access (only if none exists)
-                    from django.contrib.auth.models import User
-                    if not User.objects.filter(is_superuser=True).exists():
-                        try:
-                            User.objects.create_superuser(
-                                username='admin',
-                                email='admin@example.com',
-                                password='admin123!@#'
-                            )
-                            print("Superuser 'admin' created for testing")
-                        except Exception as e:
-                            print(f"Could not create superuser: {e}")
-                    
+                from budget_tracker.startup import ensure_database
+
+                # Copies the prebuilt snapshot into /tmp when there is one and
+                # only runs migrate (and creates the admin user) if the
+                # django_migrations table is missing migrations on disk
+                state = ensure_database()
+                if state == 'migrated':
                     print("Database initialized with clean state and authentication")
                 
                 _initialized = True
@@ -1,2 +1,12 @@
-#!/bin/bashecho "Build script started..."# Install dependenciespip install -r requirements.txt# Collect static filespython manage.py collectstatic --noinput# Run migrationspython manage.py migrate
+#!/bin/bash
+echo "Build script started..."
+# Install dependencies
+pip install -r requirements.txt
+# Collect static files
+python manage.py collectstatic --noinput
+# Run migrations
+python manage.py migrate
+# Prebuilt database that cold starts copy to /tmp instead of migrating; run this
+# script before `vercel build`, which bundles it through includeFiles in vercel.json
+python manage.py build_db_snapshot
 echo "Build script completed!"
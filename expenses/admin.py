@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Expense
+from django.db import transaction
+from . import services
+from .models import Expense, ExpenseArchive, ExpenseTombstone, MonthlyRollup
 
 @admin.register(Expense)
 class ExpenseAdmin(admin.ModelAdmin):
@@ -7,3 +9,62 @@ class ExpenseAdmin(admin.ModelAdmin):
     list_filter = ['transaction_type', 'category', 'date_created']
     search_fields = ['description']
     ordering = ['-date_created']
+
+    def save_model(self, request, obj, form, change):
+        """Keep the monthly rollups in step with admin edits"""
+        with transaction.atomic():
+            previous = None
+            if change:
+                previous = services.snapshot(Expense.objects.get(pk=obj.pk))
+            super().save_model(request, obj, form, change)
+            if previous:
+                services.expense_updated(previous, obj)
+            else:
+                services.expense_created(obj)
+
+    def delete_model(self, request, obj):
+        """Soft delete, like the API; purge_expenses removes the row later"""
+        with transaction.atomic():
+            services.expense_deleted(obj)
+            obj.soft_delete()
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            expenses = list(queryset.only('user_id', 'amount', 'category', 'transaction_type', 'date_created'))
+            services.expenses_deleted(expenses)
+            queryset.soft_delete()
+
+@admin.register(MonthlyRollup)
+class MonthlyRollupAdmin(admin.ModelAdmin):
+    list_display = ['user', 'month', 'category', 'transaction_type', 'total', 'count']
+    list_filter = ['transaction_type', 'category', 'month']
+    search_fields = ['user__username']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ExpenseTombstone)
+class ExpenseTombstoneAdmin(admin.ModelAdmin):
+    list_display = ['user', 'expense_id', 'deleted_at']
+    search_fields = ['user__username']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ExpenseArchive)
+class ExpenseArchiveAdmin(admin.ModelAdmin):
+    list_display = ['description', 'user', 'amount', 'category', 'transaction_type', 'date_created', 'deleted_at', 'archived_at']
+    list_filter = ['transaction_type', 'category', 'archived_at']
+    search_fields = ['description', 'user__username']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
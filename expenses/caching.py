@@ -0,0 +1,68 @@
+"""
+Per-user summary cache, and the cached system-wide statistics.
+
+Summary entries are keyed on the user id and the user's data version, which
+the service hooks bump on every write, so a write makes the old entry
+unreachable instead of having to delete it. System statistics have no such
+version and simply expire after SYSTEM_STATS_CACHE_TIMEOUT. The backend is
+whatever CACHES['default'] is configured to (see CACHE_BACKEND in settings).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+HITS_KEY = 'expense-summary:hits'
+MISSES_KEY = 'expense-summary:misses'
+SYSTEM_STATS_KEY = 'system-stats'
+
+
+def summary_key(user_id, version):
+    return f'expense-summary:{user_id}:{version}'
+
+
+def _count(key):
+    # The counters live in the cache too, so a shared backend (file, redis) reports
+    # the ratio across all workers
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_summary(user, version, compute):
+    """Return the cached summary of `user` at `version`, calling compute(user) on a miss"""
+    key = summary_key(user.pk, version)
+    summary = cache.get(key)
+    if summary is not None:
+        _count(HITS_KEY)
+        return summary
+
+    _count(MISSES_KEY)
+    summary = compute(user)
+    cache.set(key, summary, timeout=settings.EXPENSE_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def stats():
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        'backend': settings.CACHES['default']['BACKEND'],
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def get_system_stats(compute):
+    """Return the cached system statistics, calling compute() once they have expired"""
+    stats = cache.get(SYSTEM_STATS_KEY)
+    if stats is None:
+        stats = compute()
+        cache.set(SYSTEM_STATS_KEY, stats, timeout=settings.SYSTEM_STATS_CACHE_TIMEOUT)
+    return stats
@@ -0,0 +1,84 @@
+"""
+Background data resets.
+
+A reset started with ?async=true runs in a thread of the worker that received
+the request; its progress is kept in the cache under the job id, so any worker
+sharing the cache backend (file or redis, see CACHE_BACKEND) can report it.
+Serverless platforms may freeze a worker once its response is sent, so the
+synchronous reset stays the default.
+"""
+import logging
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import services
+from .models import MonthlyRollup
+
+logger = logging.getLogger(__name__)
+
+JOB_TIMEOUT = 24 * 3600
+
+
+def job_key(job_id):
+    return f'reset-job:{job_id}'
+
+
+def get_job(job_id):
+    return cache.get(job_key(job_id))
+
+
+def _save(job):
+    cache.set(job_key(job['id']), job, timeout=JOB_TIMEOUT)
+
+
+def start_reset(user):
+    """Start deleting `user`'s expenses in the background and return the job"""
+    # The rollups already hold the row count, so progress needs no COUNT(*) over the expenses
+    total = MonthlyRollup.objects.filter(user=user).aggregate(count=Sum('count'))['count'] or 0
+    job = {
+        'id': uuid.uuid4().hex,
+        'user_id': user.pk,
+        'status': 'running',
+        'total': total,
+        'deleted': 0,
+        'started_at': timezone.now(),
+        'finished_at': None,
+    }
+    _save(job)
+    threading.Thread(target=_run_in_thread, args=(job, user), daemon=True).start()
+    return dict(job)
+
+
+def _run_in_thread(job, user):
+    try:
+        run_reset(job, user)
+    finally:
+        # The request cycle never closes this thread's connection
+        connection.close()
+
+
+def run_reset(job, user):
+    def progress(deleted):
+        job['deleted'] = deleted
+        _save(job)
+
+    try:
+        job['deleted'] = services.delete_user_expenses(
+            user, batch_size=settings.EXPENSE_RESET_BATCH_SIZE, progress=progress,
+        )
+        with transaction.atomic():
+            services.user_data_reset(user)
+        job['status'] = 'done'
+    except Exception as e:
+        logger.error(f"Reset job {job['id']} for user {user.username} failed: {str(e)}")
+        job['status'] = 'failed'
+        job['error'] = str(e)
+    finally:
+        job['finished_at'] = timezone.now()
+        _save(job)
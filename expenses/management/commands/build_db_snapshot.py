@@ -0,0 +1,43 @@
+import os
+import sqlite3
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from budget_tracker.startup import create_admin_user
+
+
+class Command(BaseCommand):
+    help = 'Build the migrated SQLite database that cold starts copy into place'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=None,
+            help='Where to write the snapshot (default: settings.COLD_START_SNAPSHOT)',
+        )
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'] or settings.COLD_START_SNAPSHOT)
+        if connection.vendor != 'sqlite':
+            raise CommandError('Snapshots are SQLite files; point DATABASE_URL at an SQLite database')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+        # Nothing has connected yet, so the default connection opens the snapshot instead
+        connection.close()
+        connection.settings_dict['NAME'] = path
+        call_command('migrate', interactive=False, verbosity=0)
+        create_admin_user()
+        connection.close()
+
+        # One self-contained, compacted file: fold the WAL back in and vacuum
+        with sqlite3.connect(path) as snapshot:
+            snapshot.execute('PRAGMA journal_mode=DELETE')
+            snapshot.execute('VACUUM')
+            snapshot.execute('ANALYZE')
+        snapshot.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote database snapshot to {path} ({os.path.getsize(path)} bytes)'))
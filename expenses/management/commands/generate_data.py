@@ -0,0 +1,253 @@
+import contextlib
+import datetime
+import multiprocessing
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from authentication.models import UserProfile
+from expenses import services
+from expenses.models import Expense, MonthlyRollup
+
+# (category, weight, median amount, descriptions); amounts are log-normal around
+# the median, in pesos like the sample data
+EXPENSE_CATEGORIES = [
+    ('food', 35, 250, ['Groceries', 'Lunch', 'Coffee', 'Dinner out', 'Snacks', 'Food delivery']),
+    ('transport', 15, 150, ['Jeepney fare', 'Grab ride', 'Gas', 'MRT card load', 'Parking']),
+    ('shopping', 12, 1200, ['Clothes', 'Household items', 'Online order', 'Gadget accessory']),
+    ('entertainment', 10, 600, ['Movie tickets', 'Streaming subscription', 'Concert', 'Games']),
+    ('bills', 10, 2500, ['Electric bill', 'Water bill', 'Internet', 'Mobile plan', 'Rent share']),
+    ('healthcare', 5, 1500, ['Pharmacy', 'Checkup', 'Dental', 'Vitamins']),
+    ('other', 13, 500, ['Gift', 'Donation', 'Miscellaneous', 'Cash withdrawal fee']),
+]
+INCOME_CATEGORIES = [
+    ('salary', 60, 30000, ['Monthly salary', 'Salary', 'Bonus']),
+    ('freelance', 25, 12000, ['Freelance project', 'Consulting', 'Commission']),
+    ('investment', 15, 3000, ['Dividend', 'Interest', 'Stock sale']),
+]
+INCOME_SHARE = 0.15
+AMOUNT_SIGMA = 0.6
+MAX_AMOUNT = 10 ** 8 - 1  # max_digits=10, decimal_places=2, in whole pesos
+
+# Rollup keys collected before they are written; a few hundred per user
+ROLLUP_FLUSH_SIZE = 100000
+
+# Relative activity per hour of the day, 0-23
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 10, 9, 8, 9, 12, 10, 8, 8, 9, 11, 13, 12, 10, 7, 4, 2]
+
+
+# Inserted columns; deleted_at and client_id stay NULL
+COLUMNS = ('user', 'amount', 'description', 'category', 'transaction_type', 'date_created', 'updated_at')
+
+
+def generate_user(job):
+    """
+    Rows of COLUMNS for one user, and what they add to the rollups.
+
+    Runs in the worker processes. On SQLite only the command's own process
+    writes, so there is never a queue of processes for its write lock.
+    """
+    user_id, username, count, today, days, seed, _ = job
+    # Seeded per user, so the data does not depend on how users are split between processes
+    rng = random.Random(f'{seed}-{username}')
+    adapt_datetime = connection.ops.adapt_datetimefield_value
+    tz = timezone.get_current_timezone()
+    dates = [today - datetime.timedelta(days=day) for day in range(days)]
+    expense_weights = [weight for _, weight, _, _ in EXPENSE_CATEGORIES]
+    income_weights = [weight for _, weight, _, _ in INCOME_CATEGORIES]
+    # Spending levels differ between users; this scales every amount of the user
+    scale = rng.lognormvariate(0, 0.4)
+
+    rows = []
+    deltas = defaultdict(lambda: [0, 0])
+    for hour in rng.choices(range(24), HOUR_WEIGHTS, k=count):
+        if rng.random() < INCOME_SHARE:
+            category, _, median, descriptions = rng.choices(INCOME_CATEGORIES, income_weights)[0]
+            transaction_type = Expense.INCOME
+        else:
+            category, _, median, descriptions = rng.choices(EXPENSE_CATEGORIES, expense_weights)[0]
+            transaction_type = Expense.EXPENSE
+        cents = round(min(max(median * scale * rng.lognormvariate(0, AMOUNT_SIGMA), 1), MAX_AMOUNT) * 100)
+        # Local time, so HOUR_WEIGHTS follow the users' day; rollup months are local too
+        date = rng.choice(dates)
+        stored = adapt_datetime(datetime.datetime(
+            date.year, date.month, date.day, hour, rng.randrange(60), rng.randrange(60), tzinfo=tz,
+        ))
+        rows.append((
+            user_id, f'{cents // 100}.{cents % 100:02d}', rng.choice(descriptions), category, transaction_type,
+            stored, stored,
+        ))
+        delta = deltas[(date.replace(day=1), category, transaction_type)]
+        delta[0] += cents
+        delta[1] += 1
+    # Oldest first, so ids follow the dates as they do for real accounts
+    rows.sort(key=lambda row: row[5])
+    return user_id, rows, dict(deltas)
+
+
+def generate_and_insert(job):
+    """generate_user, inserting the rows from the worker; for databases with concurrent writers"""
+    user_id, rows, deltas = generate_user(job)
+    insert_rows(rows, batch_size=job[-1])
+    return user_id, len(rows), deltas
+
+
+def insert_rows(rows, batch_size):
+    opts = Expense._meta
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(opts.db_table),
+        ', '.join(quote(opts.get_field(name).column) for name in COLUMNS),
+        ', '.join(['%s'] * len(COLUMNS)),
+    )
+    for i in range(0, len(rows), batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows[i:i + batch_size])
+
+
+def add_rollups(deltas):
+    """
+    Add {(user_id, month, category, transaction_type): [cents, count]} to the rollups.
+
+    The inserted rows skip the per-write hooks. services.apply_rollup_deltas
+    costs a query or two per key, so the users' rollup rows are merged here and
+    rewritten with one bulk insert instead.
+    """
+    totals = {key: (Decimal(cents).scaleb(-2), count) for key, (cents, count) in deltas.items()}
+    with transaction.atomic():
+        rollups = MonthlyRollup.objects.filter(user_id__in={key[0] for key in deltas})
+        for *key, total, count in rollups.values_list('user_id', 'month', 'category', 'transaction_type', 'total', 'count'):
+            added, added_count = totals.get(tuple(key), (0, 0))
+            totals[tuple(key)] = (total + added, count + added_count)
+        rollups.delete()
+        MonthlyRollup.objects.bulk_create(
+            (
+                MonthlyRollup(user_id=user_id, month=month, category=category, transaction_type=transaction_type,
+                              total=total, count=count)
+                for (user_id, month, category, transaction_type), (total, count) in totals.items()
+            ),
+            batch_size=1000,
+        )
+
+
+def initialize_worker():
+    # Processes started with spawn (macOS, Windows) begin without Django set up
+    from django.apps import apps
+
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users and transactions for load and capacity testing: '
+        '--users users with --transactions transactions each, inserted in batches with '
+        'executemany, optionally from several processes. The output is the same for the '
+        'same --seed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Users to create (default: 10)')
+        parser.add_argument(
+            '--transactions', type=int, default=1000,
+            help='Transactions per user (default: 1000)',
+        )
+        parser.add_argument(
+            '--days', type=int, default=730,
+            help='Spread the transactions over this many days back from today (default: 730)',
+        )
+        parser.add_argument(
+            '--prefix', default='demo_user',
+            help='Usernames are <prefix>_<n>; existing users with those names get more '
+                 'transactions (default: demo_user)',
+        )
+        parser.add_argument(
+            '--password', default='Demo123!',
+            help='Password of the created users (default: Demo123!)',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows per INSERT batch, each in its own transaction (default: 5000)',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Processes generating the rows. They also insert them, except on SQLite, '
+                 'which takes one writer at a time (default: 1)',
+        )
+
+    def handle(self, *args, **options):
+        for name in ('users', 'batch_size', 'processes', 'days'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive")
+        if options['transactions'] < 0:
+            raise CommandError('--transactions must not be negative')
+
+        start = time.perf_counter()
+        users = self.create_users(options['users'], options['prefix'], options['password'])
+        self.stdout.write(f'{len(users)} users ready')
+
+        jobs = [
+            (user_id, username, options['transactions'], timezone.localdate(), options['days'], options['seed'],
+             options['batch_size'])
+            for user_id, username in users
+        ]
+        created = 0
+        with contextlib.ExitStack() as stack:
+            if options['processes'] > 1:
+                # Forked workers must not share the parent's database connections
+                connections.close_all()
+                pool = stack.enter_context(multiprocessing.Pool(options['processes'], initializer=initialize_worker))
+                generate = generate_user if connection.vendor == 'sqlite' else generate_and_insert
+                generated = pool.imap(generate, jobs)
+            else:
+                generated = map(generate_user, jobs)
+            pending = {}
+            for user_id, rows, deltas in generated:
+                if isinstance(rows, int):
+                    # Already inserted by the worker
+                    created += rows
+                else:
+                    insert_rows(rows, options['batch_size'])
+                    created += len(rows)
+                pending.update(((user_id, *key), delta) for key, delta in deltas.items())
+                if len(pending) >= ROLLUP_FLUSH_SIZE:
+                    add_rollups(pending)
+                    pending = {}
+            add_rollups(pending)
+        with transaction.atomic():
+            services.bump_data_version([user_id for user_id, _ in users])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} transactions for {len(users)} users in {elapsed:.1f}s ({created / elapsed:.0f} rows/s)'
+        ))
+
+    def create_users(self, count, prefix, password):
+        """Create the missing <prefix>_<n> users with their profiles; return (id, username) pairs"""
+        usernames = [f'{prefix}_{i}' for i in range(count)]
+        # Matched by prefix rather than an IN list, which would be too long for SQLite at scale
+        matching = User.objects.filter(username__startswith=f'{prefix}_')
+        existing = set(matching.values_list('username', flat=True))
+        # Hashing is slow on purpose; every user shares one hash of the same password
+        hashed = make_password(password)
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [User(username=username, password=hashed) for username in usernames if username not in existing],
+                batch_size=1000,
+            )
+            wanted = set(usernames)
+            users = [row for row in matching.order_by('id').values_list('id', 'username') if row[1] in wanted]
+            # bulk_create sends no post_save, so the profiles the signal would create are added here
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=user_id) for user_id, _ in users],
+                batch_size=1000, ignore_conflicts=True,
+            )
+        return users
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from expenses.models import Expense
+from expenses.services import purge_expenses
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove soft-deleted expenses from the expenses table, and optionally move old '
+        'transactions to the archive table, in batches; then ANALYZE and, once enough '
+        'of the file is free, VACUUM. Meant to run on a schedule (cron) at quiet hours.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deleted-days', type=int, default=7,
+            help='Only purge rows soft deleted at least this many days ago (default: 7)',
+        )
+        parser.add_argument(
+            '--older-than-days', type=int, default=None,
+            help='Also archive live transactions dated more than this many days ago; '
+                 'they no longer count in the summaries (default: keep them all)',
+        )
+        parser.add_argument(
+            '--archive', action='store_true',
+            help='Copy purged deleted rows to the archive table instead of dropping them',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows moved per transaction (default: 5000)',
+        )
+        parser.add_argument(
+            '--vacuum', choices=['auto', 'always', 'never'], default='auto',
+            help='auto vacuums when free pages exceed --vacuum-threshold of the SQLite file, '
+                 'or whenever rows were removed on PostgreSQL (default: auto)',
+        )
+        parser.add_argument(
+            '--vacuum-threshold', type=float, default=0.2,
+            help='Fraction of free pages that makes auto vacuum the SQLite file (default: 0.2)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        now = timezone.now()
+
+        deleted = Expense.all_objects.filter(deleted_at__lt=now - timedelta(days=options['deleted_days']))
+        removed = purge_expenses(deleted, archive=options['archive'], batch_size=options['batch_size'])
+        action = 'Archived' if options['archive'] else 'Purged'
+        self.stdout.write(f'{action} {removed} deleted transactions')
+
+        archived = 0
+        if options['older_than_days'] is not None:
+            old = Expense.objects.filter(date_created__lt=now - timedelta(days=options['older_than_days']))
+            archived = purge_expenses(old, archive=True, batch_size=options['batch_size'])
+            self.stdout.write(f'Archived {archived} transactions older than {options["older_than_days"]} days')
+
+        self.maintain(removed + archived, options['vacuum'], options['vacuum_threshold'])
+        self.stdout.write(self.style.SUCCESS('Done'))
+
+    def maintain(self, removed, vacuum, threshold):
+        tables = [Expense._meta.db_table]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('PRAGMA page_count')
+                pages = cursor.fetchone()[0]
+                cursor.execute('PRAGMA freelist_count')
+                free = cursor.fetchone()[0]
+                if vacuum == 'always' or (vacuum == 'auto' and pages and free / pages >= threshold):
+                    self.stdout.write(f'VACUUM ({free} of {pages} pages free)')
+                    cursor.execute('VACUUM')
+                # Refresh the statistics the planner uses to choose between the partial indexes
+                cursor.execute('ANALYZE')
+            elif connection.vendor == 'postgresql':
+                if vacuum == 'always' or (vacuum == 'auto' and removed):
+                    for table in tables:
+                        self.stdout.write(f'VACUUM ANALYZE {table}')
+                        cursor.execute(f'VACUUM ANALYZE {connection.ops.quote_name(table)}')
+                else:
+                    for table in tables:
+                        cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
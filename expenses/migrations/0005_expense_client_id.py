@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_monthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='client_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='expense',
+            constraint=models.UniqueConstraint(fields=('user', 'client_id'), name='unique_expense_client_id'),
+        ),
+    ]
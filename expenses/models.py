@@ -2,6 +2,26 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+
+class ExpenseQuerySet(models.QuerySet):
+    def soft_delete(self):
+        """Mark the expenses deleted; purge_expenses removes them from the table later"""
+        now = timezone.now()
+        return self.update(deleted_at=now, updated_at=now)
+
+
+class LiveExpenseManager(models.Manager.from_queryset(ExpenseQuerySet)):
+    """Expenses that have not been soft deleted"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+# Every index and the client_id constraint only cover live rows, so soft-deleted
+# expenses waiting to be purged cost the hot queries nothing
+LIVE = models.Q(deleted_at__isnull=True)
+
+
 class Expense(models.Model):
     INCOME = 'income'
     EXPENSE = 'expense'
@@ -29,9 +49,129 @@ class Expense(models.Model):
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='other')
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPE_CHOICES)
     date_created = models.DateTimeField(default=timezone.now)
+    # Generated by the client so offline writes can be replayed without duplicates
+    client_id = models.UUIDField(null=True, blank=True)
+    # Bumped on every write; the changes feed returns rows modified after a token
+    updated_at = models.DateTimeField(auto_now=True)
+    # Set instead of deleting the row; the default manager hides these rows
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = LiveExpenseManager()
+    # Includes soft-deleted rows, for purging and archiving
+    all_objects = ExpenseQuerySet.as_manager()
     
     class Meta:
         ordering = ['-date_created']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], condition=LIVE, name='unique_expense_client_id'),
+        ]
+        indexes = [
+            # Transaction list: WHERE user_id = ? ORDER BY date_created DESC, id DESC
+            models.Index(fields=['user', '-date_created', '-id'], condition=LIVE, name='expense_user_date_idx'),
+            # Summaries and range filters: WHERE user_id = ? AND transaction_type = ?
+            # (amount is included so SUM(amount) is answered from the index alone)
+            models.Index(
+                fields=['user', 'transaction_type', 'date_created', 'amount'],
+                condition=LIVE, name='expense_user_type_date_idx',
+            ),
+            # Changes feed: WHERE user_id = ? AND updated_at >= ?
+            models.Index(fields=['user', 'updated_at'], condition=LIVE, name='expense_user_updated_idx'),
+            # purge_expenses: WHERE deleted_at < ?
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='expense_deleted_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type.title()}: {self.description} - ₱{self.amount}"
+    
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at', 'updated_at'])
+
+
+class MonthlyRollup(models.Model):
+    """Per-user monthly totals by category and type, kept in step with Expense writes"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups')
+    month = models.DateField()  # First day of the month
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    transaction_type = models.CharField(max_length=10, choices=Expense.TRANSACTION_TYPE_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'category', 'transaction_type'],
+                name='unique_monthly_rollup',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.month:%Y-%m} {self.category} {self.transaction_type}: ₱{self.total}"
+
+
+class ExpenseArchive(models.Model):
+    """
+    Expenses moved out of the expenses table by purge_expenses.
+
+    Rows keep their original id. Archived rows no longer count in the monthly
+    rollups, and a data reset deletes the user's archived rows as well.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_expenses', null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    description = models.CharField(max_length=255)
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    transaction_type = models.CharField(max_length=10, choices=Expense.TRANSACTION_TYPE_CHOICES)
+    date_created = models.DateTimeField()
+    client_id = models.UUIDField(null=True, blank=True)
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['user', 'date_created'], name='archive_user_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username if self.user else '-'} - archived expense {self.id}"
+
+
+class ExpenseTombstone(models.Model):
+    """
+    Records a deleted expense so the changes feed can report it.
+
+    A tombstone without an expense_id marks a reset: everything the user had
+    before deleted_at is gone.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_tombstones')
+    expense_id = models.IntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
+    
+    def __str__(self):
+        if self.expense_id is None:
+            return f"{self.user.username} - reset at {self.deleted_at:%Y-%m-%d %H:%M}"
+        return f"{self.user.username} - expense {self.expense_id} deleted"
+
+
+class UserDataVersion(models.Model):
+    """
+    Per-user counter bumped on every write to the user's expenses.
+
+    Cheap to read, so the API can answer conditional requests (ETag and
+    Last-Modified) without touching the expenses table.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.user.username} - version {self.version}"
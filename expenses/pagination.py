@@ -0,0 +1,87 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ExpenseCursorPagination(BasePagination):
+    """
+    Keyset pagination over (date_created, id), newest first.
+
+    The cursor is an opaque token holding the position of the last row of the
+    previous page, so every page is a single range scan no matter how far the
+    client has scrolled.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-date_created', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            date_created, pk = position
+            queryset = queryset.filter(
+                Q(date_created__lt=date_created) | Q(date_created=date_created, id__lt=pk)
+            )
+
+        # Fetch one extra row to know whether another page exists
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        default = getattr(settings, 'EXPENSE_PAGE_SIZE', 50)
+        maximum = getattr(settings, 'EXPENSE_MAX_PAGE_SIZE', 200)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, default))
+        except (TypeError, ValueError):
+            page_size = default
+        return max(1, min(page_size, maximum))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last))
+
+    def encode_cursor(self, row):
+        """Encode the (date_created, id) position of a row as an opaque token"""
+        position = json.dumps([row.date_created.isoformat(), row.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        """Return the (date_created, id) position encoded in the request, if any"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            date_created, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            date_created = parse_datetime(date_created)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if date_created is None:
+            raise NotFound(self.invalid_cursor_message)
+        return date_created, pk
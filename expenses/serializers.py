@@ -1,4 +1,9 @@
-from rest_framework import serializers
+import decimal
+
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import CharField, ChoiceField, DateTimeField, DecimalField, IntegerField
+from rest_framework.settings import api_settings
 from .models import Expense
 
 class ExpenseSerializer(serializers.ModelSerializer):
@@ -6,14 +11,100 @@ class ExpenseSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Expense
-        fields = ['id', 'amount', 'description', 'category', 'transaction_type', 'date_created', 'username']
-        read_only_fields = ['id', 'date_created', 'username']
+        fields = [
+            'id', 'amount', 'description', 'category', 'transaction_type', 'date_created', 'updated_at',
+            'client_id', 'username',
+        ]
+        read_only_fields = ['id', 'date_created', 'updated_at', 'username']
     
     def validate_amount(self, value):
         if value <= 0:
             raise serializers.ValidationError("Amount must be greater than 0")
         return value
     
+    def update(self, instance, validated_data):
+        # client_id identifies the row for offline replays, so it can't change afterwards
+        validated_data.pop('client_id', None)
+        return super().update(instance, validated_data)
+    
     def get_username(self, obj):
         """Include username to help with cross-device localStorage handling"""
-        return obj.user.username if obj.user else None
+        # The API only serves the requesting user's rows, so answer from request.user
+        # instead of loading obj.user (one query per serialized row)
+        request = self.context.get('request')
+        if request is not None and obj.user_id is not None and obj.user_id == request.user.pk:
+            return request.user.username
+        return obj.user.username if obj.user_id else None
+
+
+class ExpenseImportSerializer(ExpenseSerializer):
+    """ExpenseSerializer rules for imported rows, which may carry their original date"""
+    
+    class Meta(ExpenseSerializer.Meta):
+        read_only_fields = ['id', 'username']
+        extra_kwargs = {'date_created': {'required': False}}
+
+
+class ExpenseRowSerializer:
+    """
+    Read-only fast path for rendering large expense lists.
+
+    Works on rows from ``queryset.values_list(*ExpenseRowSerializer.columns, named=True)``
+    instead of model instances. Each column is converted by a function compiled
+    once from the matching ExpenseSerializer field, so the output is identical to
+    ExpenseSerializer's (amount as a decimal string, ISO 8601 date_created)
+    without the per-row field machinery.
+    """
+    columns = tuple(name for name in ExpenseSerializer.Meta.fields if name != 'username')
+    
+    # Fields whose representation of a database value is the value itself
+    passthrough_fields = (CharField, ChoiceField, IntegerField)
+    
+    def __init__(self, username=None):
+        self.username = username
+        fields = ExpenseSerializer().fields
+        self.converters = tuple(self.compile_field(fields[name]) for name in self.columns)
+    
+    def compile_field(self, field):
+        """Return a value -> primitive function equivalent to field.to_representation"""
+        if isinstance(field, self.passthrough_fields):
+            return None
+        
+        coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if isinstance(field, DecimalField) and coerce_to_string and not field.localize:
+            quantum = decimal.Decimal('.1') ** field.decimal_places
+            context = decimal.getcontext().copy()
+            if field.max_digits is not None:
+                context.prec = field.max_digits
+            rounding = field.rounding
+            
+            def to_decimal_string(value):
+                return '{:f}'.format(value.quantize(quantum, rounding=rounding, context=context))
+            return to_decimal_string
+        
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if isinstance(field, DateTimeField) and output_format and output_format.lower() == ISO_8601:
+            # DRF resolves the current time zone per value; do it once per render
+            tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+            
+            def to_iso_datetime(value):
+                if tz is not None and timezone.is_aware(value):
+                    value = value.astimezone(tz)
+                value = value.isoformat()
+                if value.endswith('+00:00'):
+                    value = value[:-6] + 'Z'
+                return value
+            return to_iso_datetime
+        
+        return field.to_representation
+    
+    def to_representation(self, row):
+        data = {
+            name: value if convert is None or value is None else convert(value)
+            for name, convert, value in zip(self.columns, self.converters, row)
+        }
+        data['username'] = self.username
+        return data
+    
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
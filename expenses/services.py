@@ -0,0 +1,288 @@
+"""
+Bookkeeping that has to happen alongside every Expense write.
+
+The API views, the admin and the bulk paths call these hooks inside the same
+transaction as the write itself, so derived data never drifts from the
+expenses table.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Max, Sum
+from django.db.models.deletion import Collector
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Expense, ExpenseArchive, ExpenseTombstone, MonthlyRollup, UserDataVersion
+
+
+def month_of(value):
+    """First day of the month `value` falls in, in the current time zone"""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date().replace(day=1)
+
+
+def rollup_key(expense):
+    """The MonthlyRollup row an expense is counted in"""
+    return (expense.user_id, month_of(expense.date_created), expense.category, expense.transaction_type)
+
+
+def snapshot(expense):
+    """Capture what an expense contributes to the rollups before it is modified"""
+    return rollup_key(expense), expense.amount
+
+
+def apply_rollup_deltas(deltas):
+    """Add {rollup_key: (amount, count)} deltas to the rollup table"""
+    for (user_id, month, category, transaction_type), (amount, count) in deltas.items():
+        if user_id is None or (not amount and not count):
+            continue
+
+        lookup = {
+            'user_id': user_id,
+            'month': month,
+            'category': category,
+            'transaction_type': transaction_type,
+        }
+        rollups = MonthlyRollup.objects.filter(**lookup)
+        updated = rollups.update(total=F('total') + amount, count=F('count') + count)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    MonthlyRollup.objects.create(total=amount, count=count, **lookup)
+            except IntegrityError:
+                # A concurrent writer created the row first
+                rollups.update(total=F('total') + amount, count=F('count') + count)
+
+        if count < 0:
+            rollups.filter(count__lte=0).delete()
+
+
+def bump_data_version(user_ids):
+    """Mark the data of `user_ids` as changed, invalidating their ETags"""
+    now = timezone.now()
+    for user_id in set(user_ids) - {None}:
+        versions = UserDataVersion.objects.filter(user_id=user_id)
+        updated = versions.update(version=F('version') + 1, updated_at=now)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    UserDataVersion.objects.create(user_id=user_id, version=1, updated_at=now)
+            except IntegrityError:
+                versions.update(version=F('version') + 1, updated_at=now)
+
+
+def data_version(user):
+    """(version, last modified) of a user's data; (0, None) before their first write"""
+    row = UserDataVersion.objects.filter(user=user).values_list('version', 'updated_at').first()
+    return row or (0, None)
+
+
+def _deltas(expenses, sign):
+    deltas = defaultdict(lambda: (Decimal('0'), 0))
+    for expense in expenses:
+        key = rollup_key(expense)
+        amount, count = deltas[key]
+        deltas[key] = (amount + sign * expense.amount, count + sign)
+    return deltas
+
+
+def expense_created(expense):
+    expenses_created([expense])
+
+
+def expenses_created(expenses):
+    """Bulk variant of expense_created; one rollup update per affected group"""
+    apply_rollup_deltas(_deltas(expenses, 1))
+    bump_data_version(expense.user_id for expense in expenses)
+
+
+def expense_updated(previous, expense):
+    """`previous` is the snapshot() taken before the expense was changed"""
+    old_key, old_amount = previous
+    new_key = rollup_key(expense)
+    if old_key == new_key:
+        apply_rollup_deltas({new_key: (expense.amount - old_amount, 0)})
+    else:
+        apply_rollup_deltas({old_key: (-old_amount, -1), new_key: (expense.amount, 1)})
+    _reassigned([previous], [expense])
+    bump_data_version([old_key[0], expense.user_id])
+
+
+def expenses_updated(previous, expenses):
+    """Bulk variant of expense_updated; `previous` holds the snapshot() of each expense, in the same order"""
+    deltas = _deltas(expenses, 1)
+    for key, old_amount in previous:
+        amount, count = deltas[key]
+        deltas[key] = (amount - old_amount, count - 1)
+    apply_rollup_deltas(deltas)
+    _reassigned(previous, expenses)
+    bump_data_version([key[0] for key, _ in previous] + [expense.user_id for expense in expenses])
+
+
+def _reassigned(previous, expenses):
+    """Tombstones for the previous owners of expenses moved to another user (in the admin)"""
+    deleted_at = timezone.now()
+    ExpenseTombstone.objects.bulk_create(
+        ExpenseTombstone(user_id=old_key[0], expense_id=expense.pk, deleted_at=deleted_at)
+        for (old_key, _), expense in zip(previous, expenses)
+        if old_key[0] is not None and old_key[0] != expense.user_id
+    )
+
+
+def expense_deleted(expense):
+    expenses_deleted([expense])
+
+
+def expenses_deleted(expenses):
+    """Call before the expenses are soft deleted (or, for a hard delete, before delete() clears their keys)"""
+    apply_rollup_deltas(_deltas(expenses, -1))
+    deleted_at = timezone.now()
+    ExpenseTombstone.objects.bulk_create(
+        ExpenseTombstone(user_id=expense.user_id, expense_id=expense.pk, deleted_at=deleted_at)
+        for expense in expenses
+        if expense.user_id is not None
+    )
+    bump_data_version(expense.user_id for expense in expenses)
+
+
+def user_data_reset(user):
+    """Called after all of a user's expenses were deleted"""
+    # A reset covers the archive too, deleted and old transactions alike
+    ExpenseArchive.objects.filter(user=user).delete()
+    # Rebuilt rather than emptied: a chunked reset only deletes the rows that
+    # existed when it started, so expenses added meanwhile keep their totals.
+    # This also bumps the user's data version
+    rebuild_rollups(users=[user])
+    # One marker replaces the per-row tombstones: clients syncing from before it
+    # are told to drop everything
+    ExpenseTombstone.objects.filter(user=user).delete()
+    ExpenseTombstone.objects.create(user=user, expense_id=None)
+
+
+def pk_batches(queryset, batch_size):
+    """
+    Split `queryset` into consecutive primary key ranges of `batch_size` rows.
+
+    Only rows up to the largest primary key at the start are covered, so rows
+    created meanwhile are left alone, and the primary keys are never all
+    loaded at once. Each yielded queryset is meant to be written in its own
+    short transaction.
+    """
+    last_pk = queryset.aggregate(last=Max('pk'))['last']
+    if last_pk is None:
+        return
+    queryset = queryset.filter(pk__lte=last_pk).order_by('pk')
+    start = 0
+    while True:
+        end = queryset.filter(pk__gt=start).values_list('pk', flat=True)[batch_size - 1:batch_size].first()
+        yield queryset.filter(pk__gt=start, pk__lte=end or last_pk)
+        if end is None or end >= last_pk:
+            return
+        start = end
+
+
+def delete_user_expenses(user, batch_size=5000, progress=None):
+    """
+    Soft delete the expenses `user` had when this started, `batch_size` rows
+    per transaction, and return how many were deleted.
+
+    No transaction holds the write lock for long; purge_expenses removes the
+    rows from the table later. progress(deleted) is called after every batch.
+    Call user_data_reset() once this returns.
+    """
+    deleted = 0
+    for batch in pk_batches(Expense.objects.filter(user=user), batch_size):
+        with transaction.atomic():
+            deleted += batch.soft_delete()
+        if progress is not None:
+            progress(deleted)
+    return deleted
+
+
+def purge_expenses(expenses, archive=False, batch_size=5000):
+    """
+    Remove `expenses` (an Expense.all_objects queryset) from the expenses
+    table in primary key batches, copying them to ExpenseArchive first if
+    `archive` is set. Returns how many rows were removed.
+
+    Live rows go through expenses_deleted, so they stop counting in the
+    rollups and clients are told to drop them, like any deleted transaction;
+    soft-deleted rows were already subtracted.
+    """
+    fields = [field.attname for field in ExpenseArchive._meta.concrete_fields if field.name != 'archived_at']
+    removed = 0
+    for batch in pk_batches(expenses, batch_size):
+        using = batch.db
+        with transaction.atomic(using=using):
+            # Also bumps the data version of the users whose live rows leave, in this
+            # batch's transaction, so their ETags and cached summaries go stale with it
+            expenses_deleted(list(batch.filter(deleted_at=None)))
+            if archive:
+                # A row already in the archive raises IntegrityError and rolls the batch
+                # back, rather than being deleted without a copy
+                ExpenseArchive.objects.using(using).bulk_create(
+                    (ExpenseArchive(**row) for row in batch.values(*fields)),
+                    batch_size=1000,
+                )
+            # Expense has no cascades or delete signals, so the rows can go straight
+            # to DELETE without the collector loading them, unless that changes
+            if Collector(using=using).can_fast_delete(batch):
+                removed += batch._raw_delete(using)
+            else:
+                removed += batch.delete()[0]
+    return removed
+
+
+def rollup_totals(expenses):
+    """{rollup_key: (total, count)} of `expenses`, from one grouped query"""
+    groups = (
+        expenses
+        .annotate(month=TruncMonth('date_created', output_field=DateField()))
+        .values('user_id', 'month', 'category', 'transaction_type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    totals = {}
+    for group in groups.iterator():
+        key = (group['user_id'], group['month'], group['category'], group['transaction_type'])
+        totals[key] = (group['total'], group['count'])
+    return totals
+
+
+def rebuild_rollups(users=None, batch_size=1000):
+    """
+    Recompute the rollup table from scratch, for everyone or for `users`, and
+    bump the data version of every user whose rollups were rewritten.
+    """
+    # Only live rows count; archived rows were subtracted when they were archived
+    source = Expense.objects.exclude(user=None)
+    rollups = MonthlyRollup.objects.all()
+    if users is not None:
+        source = source.filter(user__in=users)
+        rollups = rollups.filter(user__in=users)
+
+    # Read and rewritten in one transaction, after locking the rollup rows, so a
+    # write that commits meanwhile either is in the totals or applies its delta
+    # to the rebuilt rows; never to rows that are about to be replaced. SQLite
+    # gets the same from BEGIN IMMEDIATE taking the write lock up front
+    with transaction.atomic():
+        # Everyone whose totals may change, so their cached summaries and ETags go stale
+        affected = set(rollups.select_for_update().values_list('user_id', flat=True))
+        totals = rollup_totals(source)
+        affected.update(key[0] for key in totals)
+        if users is not None:
+            affected.update(user.pk for user in users)
+        rollups.delete()
+        created = MonthlyRollup.objects.bulk_create(
+            (
+                MonthlyRollup(user_id=user_id, month=month, category=category, transaction_type=transaction_type,
+                              total=total, count=count)
+                for (user_id, month, category, transaction_type), (total, count) in totals.items()
+            ),
+            batch_size=batch_size,
+        )
+        bump_data_version(affected)
+    return len(created)
@@ -1,3 +1,1076 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import threading
+import time
+import tracemalloc
+import unittest
+from unittest import mock
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from authentication.models import UserProfile
+
+from . import caching, jobs, services, views
+from .models import Expense, ExpenseArchive, ExpenseTombstone, MonthlyRollup
+from .serializers import ExpenseRowSerializer, ExpenseSerializer
+
+
+class ExpenseAPITestCase(TestCase):
+    """Shared fixtures for the expense API tests"""
+
+    def setUp(self):
+        # Cache keys are built from user ids and versions, which repeat between tests
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='Secret123!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_expenses(self, count, user=None, **overrides):
+        """Bulk insert `count` expenses, newest first, one minute apart"""
+        now = timezone.now()
+        expenses = [
+            Expense(
+                user=user or self.user,
+                amount=Decimal('10.00') + i,
+                description=f'Expense {i}',
+                category='food',
+                transaction_type='expense',
+                date_created=now - timedelta(minutes=i),
+                **overrides,
+            )
+            for i in range(count)
+        ]
+        Expense.objects.bulk_create(expenses)
+        services.expenses_created(expenses)
+        return expenses
+
+
+@override_settings(EXPENSE_PAGE_SIZE=5, EXPENSE_MAX_PAGE_SIZE=10)
+class ExpenseCursorPaginationTests(ExpenseAPITestCase):
+    url = reverse('expenses:expense-list-create')
+
+    def collect_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_follow_model_ordering(self):
+        expenses = self.create_expenses(12)
+        ids = self.collect_pages(self.url)
+        self.assertEqual(ids, [expense.id for expense in expenses])
+
+    def test_ties_on_date_created_are_broken_by_id(self):
+        moment = timezone.now()
+        Expense.objects.bulk_create([
+            Expense(user=self.user, amount=1, description=str(i), transaction_type='expense', date_created=moment)
+            for i in range(7)
+        ])
+        ids = self.collect_pages(self.url)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), 7)
+
+    def test_cursor_is_stable_across_inserts(self):
+        self.create_expenses(8)
+        first = self.client.get(self.url).data
+        Expense.objects.create(user=self.user, amount=5, description='New', transaction_type='income')
+
+        second = self.client.get(first['next']).data
+        self.assertEqual(len(second['results']), 3)
+        self.assertIsNone(second['next'])
+
+    def test_page_size_is_capped(self):
+        self.create_expenses(15)
+        response = self.client.get(self.url, {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_users_rows_are_not_listed(self):
+        other = User.objects.create_user(username='otheruser', password='Secret123!')
+        self.create_expenses(3, user=other)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['results'], [])
+        self.assertIsNone(response.data['next'])
+
+
+class ExpenseSummaryTests(ExpenseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        rows = [
+            ('5000.00', 'salary', 'income'),
+            ('1500.00', 'freelance', 'income'),
+            ('250.50', 'food', 'expense'),
+            ('120.25', 'food', 'expense'),
+            ('900.00', 'bills', 'expense'),
+        ]
+        expenses = Expense.objects.bulk_create([
+            Expense(user=self.user, amount=Decimal(amount), description=category, category=category, transaction_type=kind)
+            for amount, category, kind in rows
+        ])
+        other = User.objects.create_user(username='otheruser', password='Secret123!')
+        expenses.append(
+            Expense.objects.create(user=other, amount=Decimal('99.00'), description='x', category='food', transaction_type='expense')
+        )
+        services.expenses_created(expenses)
+
+    def get_summary(self):
+        request = APIRequestFactory().get('/api/summary/')
+        force_authenticate(request, user=self.user)
+        return views.expense_summary(request)
+
+    def test_totals_and_categories(self):
+        data = self.get_summary().data
+        self.assertEqual(data['income_total'], Decimal('6500.00'))
+        self.assertEqual(data['expense_total'], Decimal('1270.75'))
+        self.assertEqual(data['balance'], Decimal('5229.25'))
+
+        categories = {(row['category'], row['transaction_type']): row for row in data['categories']}
+        self.assertEqual(categories[('food', 'expense')]['total'], Decimal('370.75'))
+        self.assertEqual(categories[('food', 'expense')]['count'], 2)
+        self.assertEqual(categories[('salary', 'income')]['count'], 1)
+        self.assertEqual(len(categories), 4)
+
+    def test_summary_runs_one_rollup_query(self):
+        # Plus the data version lookup behind the ETag
+        with self.assertNumQueries(2):
+            self.get_summary()
+
+    def test_empty_summary(self):
+        Expense.objects.filter(user=self.user).delete()
+        services.user_data_reset(self.user)
+        data = self.get_summary().data
+        self.assertEqual((data['income_total'], data['expense_total'], data['balance']), (0, 0, 0))
+        self.assertEqual(data['categories'], [])
+
+
+class MonthlyRollupTests(ExpenseAPITestCase):
+    list_url = reverse('expenses:expense-list-create')
+
+    def rollups(self):
+        return {
+            (rollup.month.strftime('%Y-%m'), rollup.category, rollup.transaction_type): (rollup.total, rollup.count)
+            for rollup in MonthlyRollup.objects.filter(user=self.user)
+        }
+
+    def test_api_writes_maintain_rollups(self):
+        month = timezone.now().strftime('%Y-%m')
+        response = self.client.post(self.list_url, {
+            'amount': '25.50', 'description': 'Lunch', 'category': 'food', 'transaction_type': 'expense',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.client.post(self.list_url, {
+            'amount': '10.00', 'description': 'Snack', 'category': 'food', 'transaction_type': 'expense',
+        }, format='json')
+        self.assertEqual(self.rollups(), {(month, 'food', 'expense'): (Decimal('35.50'), 2)})
+
+        detail_url = reverse('expenses:expense-detail', args=[response.data['id']])
+        self.client.patch(detail_url, {'amount': '30.00'}, format='json')
+        self.assertEqual(self.rollups(), {(month, 'food', 'expense'): (Decimal('40.00'), 2)})
+
+        self.client.patch(detail_url, {'category': 'bills'}, format='json')
+        self.assertEqual(self.rollups(), {
+            (month, 'food', 'expense'): (Decimal('10.00'), 1),
+            (month, 'bills', 'expense'): (Decimal('30.00'), 1),
+        })
+
+        self.client.delete(detail_url)
+        self.assertEqual(self.rollups(), {(month, 'food', 'expense'): (Decimal('10.00'), 1)})
+
+    def test_rebuild_matches_incremental_rollups(self):
+        now = timezone.now()
+        self.create_expenses(40)
+        expenses = Expense.objects.bulk_create([
+            Expense(user=self.user, amount=Decimal('100.00'), description='Old', category='salary',
+                    transaction_type='income', date_created=now - timedelta(days=31 * months_ago))
+            for months_ago in (1, 3, 3)
+        ])
+        services.expenses_created(expenses)
+        incremental = self.rollups()
+
+        services.rebuild_rollups()
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_rebuild_refreshes_cached_summaries(self):
+        expense = self.create_expenses(1)[0]
+        other = User.objects.create_user(username='otheruser', password='Secret123!')
+        self.create_expenses(1, user=other)
+        self.assertEqual(self.client.get(reverse('expenses:expense-summary')).data['expense_total'], Decimal('10.00'))
+        other_version = services.data_version(other)
+
+        # A write that skipped the hooks, fixed up by the command
+        Expense.objects.filter(pk=expense.pk).update(amount=Decimal('99.00'))
+        call_command('rebuild_rollups', '--user', self.user.username, stdout=io.StringIO())
+
+        self.assertEqual(self.client.get(reverse('expenses:expense-summary')).data['expense_total'], Decimal('99.00'))
+        self.assertEqual(services.data_version(other), other_version)
+
+    def test_monthly_summary(self):
+        now = timezone.now()
+        expenses = Expense.objects.bulk_create([
+            Expense(user=self.user, amount=Decimal('1000.00'), description='Pay', category='salary',
+                    transaction_type='income', date_created=now - timedelta(days=62)),
+            Expense(user=self.user, amount=Decimal('200.00'), description='Food', category='food',
+                    transaction_type='expense', date_created=now - timedelta(days=62)),
+            Expense(user=self.user, amount=Decimal('50.00'), description='Food', category='food',
+                    transaction_type='expense', date_created=now),
+        ])
+        services.expenses_created(expenses)
+
+        months = self.client.get(reverse('expenses:monthly-summary')).data['months']
+        self.assertEqual(len(months), 2)
+        self.assertEqual(months[0]['balance'], Decimal('800.00'))
+        self.assertEqual(months[1]['month'], now.strftime('%Y-%m'))
+        self.assertEqual(months[1]['expense_total'], Decimal('50.00'))
+
+        recent = self.client.get(reverse('expenses:monthly-summary'), {'months': 1}).data['months']
+        self.assertEqual([entry['month'] for entry in recent], [now.strftime('%Y-%m')])
+
+
+class RollupRebuildConcurrencyTests(TransactionTestCase):
+    """rebuild_rollups against a write committed from another connection while it runs"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rebuilduser', password='Secret123!')
+        self.add_expense(Decimal('10.00'))
+
+    def add_expense(self, amount):
+        with transaction.atomic():
+            expense = Expense.objects.create(user=self.user, amount=amount, description='Row', category='food')
+            services.expense_created(expense)
+
+    def concurrent_add_expense(self, amount):
+        try:
+            # Another connection; in-memory SQLite fails at once instead of waiting on the lock
+            for _ in range(100):
+                try:
+                    return self.add_expense(amount)
+                except OperationalError:
+                    time.sleep(0.05)
+        finally:
+            connection.close()
+
+    def test_write_during_rebuild_keeps_its_delta(self):
+        rollup_totals = services.rollup_totals
+        writers = []
+
+        def totals_then_write(expenses):
+            totals = rollup_totals(expenses)
+            writer = threading.Thread(target=self.concurrent_add_expense, args=(Decimal('5.00'),))
+            writer.start()
+            writer.join(0.5)
+            writers.append(writer)
+            return totals
+
+        with mock.patch('expenses.services.rollup_totals', totals_then_write):
+            services.rebuild_rollups(users=[self.user])
+        writers[0].join(10)
+
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+        rollup = MonthlyRollup.objects.get(user=self.user)
+        self.assertEqual((rollup.total, rollup.count), (Decimal('15.00'), 2))
+
+
+class ExpenseQueryCountTests(ExpenseAPITestCase):
+    """The number of queries for a list response must not grow with the number of rows"""
+    sizes = (10, 1000, 10000)
+
+    def count_list_queries(self, page_size):
+        request = APIRequestFactory().get('/api/expenses/', {'page_size': page_size})
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = views.ExpenseListCreateAPIView.as_view()(request)
+            response.render()
+        self.assertEqual(len(response.data['results']), page_size)
+        return len(queries)
+
+    @override_settings(EXPENSE_MAX_PAGE_SIZE=10000)
+    def test_list_query_count_is_constant(self):
+        self.create_expenses(max(self.sizes))
+        counts = {size: self.count_list_queries(size) for size in self.sizes}
+        self.assertEqual(len(set(counts.values())), 1, f'Query count grows with page size: {counts}')
+        self.assertEqual(counts[10], 2)  # the data version and one page
+
+    def test_detail_runs_one_expense_query(self):
+        expense = self.create_expenses(1)[0]
+        request = APIRequestFactory().get(f'/api/expenses/{expense.pk}/')
+        force_authenticate(request, user=self.user)
+        with self.assertNumQueries(2):  # the data version and the expense
+            response = views.ExpenseRetrieveUpdateDestroyAPIView.as_view()(request, pk=expense.pk)
+        self.assertEqual(response.data['username'], self.user.username)
+
+
+class ExpenseRowSerializerTests(ExpenseAPITestCase):
+    def test_output_matches_expense_serializer_byte_for_byte(self):
+        self.create_expenses(5)
+        Expense.objects.create(
+            user=self.user, amount=Decimal('1234567.5'), description='Unicode ₱ "quoted"', category='other',
+            transaction_type='income', date_created=timezone.now().replace(microsecond=0),
+        )
+        queryset = Expense.objects.filter(user=self.user).order_by('-date_created', '-id')
+
+        request = APIRequestFactory().get('/api/expenses/')
+        request.user = self.user
+        expected = ExpenseSerializer(queryset, many=True, context={'request': request}).data
+        rows = queryset.values_list(*ExpenseRowSerializer.columns, named=True)
+        actual = ExpenseRowSerializer(username=self.user.username).many(rows)
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+        self.assertIn('1234567.50', [row['amount'] for row in actual])
+
+
+class ExpenseExportTests(ExpenseAPITestCase):
+    url = reverse('expenses:expense-export')
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_matches_api_representation(self):
+        self.create_expenses(3)
+        lines = self.export().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['description'] for row in rows], ['Expense 2', 'Expense 1', 'Expense 0'])
+
+        detail = self.client.get(reverse('expenses:expense-detail', args=[rows[0]['id']])).data
+        self.assertEqual(rows[0], json.loads(json.dumps(detail)))
+
+    def test_csv_export(self):
+        self.create_expenses(2)
+        rows = list(csv.DictReader(io.StringIO(self.export(output='csv'))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['amount'], '11.00')
+
+    def test_filters(self):
+        now = timezone.now()
+        expenses = Expense.objects.bulk_create([
+            Expense(user=self.user, amount=1, description='old', category='food', transaction_type='expense',
+                    date_created=now - timedelta(days=10)),
+            Expense(user=self.user, amount=1, description='bills', category='bills', transaction_type='expense',
+                    date_created=now - timedelta(days=1)),
+            Expense(user=self.user, amount=1, description='food', category='food', transaction_type='expense',
+                    date_created=now - timedelta(days=1)),
+        ])
+        start = (now - timedelta(days=2)).date().isoformat()
+        end = (now - timedelta(days=1)).date().isoformat()
+
+        descriptions = lambda **params: [json.loads(line)['description'] for line in self.export(**params).splitlines()]
+        self.assertEqual(descriptions(start=start), ['bills', 'food'])
+        self.assertEqual(descriptions(end=end), ['old', 'bills', 'food'])
+        self.assertEqual(descriptions(category='food'), ['old', 'food'])
+        self.assertEqual(descriptions(category='food,bills', start=start), ['bills', 'food'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': 'yesterday'}).status_code, 400)
+
+    @tag('slow')
+    @unittest.skipUnless(os.environ.get('RUN_SLOW_TESTS'), 'set RUN_SLOW_TESTS=1 to run (takes a minute or two)')
+    def test_memory_stays_bounded_for_500k_rows(self):
+        rows = 500000
+        now = timezone.now().replace(tzinfo=None)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO expenses_expense '
+                '(user_id, amount, description, category, transaction_type, date_created, updated_at) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                (
+                    (self.user.id, '12.34', f'Expense {i}', 'food', 'expense', date_created, date_created)
+                    for i in range(rows)
+                    for date_created in [(now - timedelta(seconds=i)).isoformat(' ')]
+                ),
+            )
+
+        response = self.client.get(self.url)
+        tracemalloc.start()
+        try:
+            exported = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(exported, rows)
+        # Materializing 500k rows takes hundreds of MB; streaming should stay within a few chunks
+        self.assertLess(peak, 20 * 1024 * 1024, f'Peak traced memory was {peak / 1024 / 1024:.1f} MB')
+
+
+class ExpenseBulkCreateTests(ExpenseAPITestCase):
+    url = reverse('expenses:expense-bulk-create')
+
+    def test_json_import_with_per_row_errors(self):
+        rows = [
+            {'amount': '12.50', 'description': 'Lunch', 'category': 'food', 'transaction_type': 'expense'},
+            {'amount': '-3', 'description': 'Negative', 'category': 'food', 'transaction_type': 'expense'},
+            {'amount': '1000', 'description': 'Pay', 'category': 'salary', 'transaction_type': 'income',
+             'date_created': '2024-03-05T10:00:00Z'},
+            {'description': 'Missing amount', 'transaction_type': 'expense'},
+        ]
+        response = self.client.post(self.url, rows, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 3])
+        self.assertIn('amount', response.data['errors'][0]['errors'])
+        self.assertEqual(
+            Expense.objects.get(description='Pay').date_created.isoformat(), '2024-03-05T10:00:00+00:00'
+        )
+        self.assertEqual(
+            MonthlyRollup.objects.get(user=self.user, month='2024-03-01').total, Decimal('1000.00')
+        )
+
+    @override_settings(EXPENSE_BULK_BATCH_SIZE=10)
+    def test_inserts_in_batches(self):
+        rows = [
+            {'amount': '1.00', 'description': f'Row {i}', 'category': 'food', 'transaction_type': 'expense'}
+            for i in range(35)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.data['created'], 35)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "expenses_expense"')]
+        self.assertEqual(len(inserts), 4)
+
+    def test_csv_upload(self):
+        content = (
+            'amount,description,category,transaction_type\n'
+            '5.00,Bus,transport,expense\n'
+            '20.00,Gift,other,income\n'
+        )
+        upload = SimpleUploadedFile('import.csv', content.encode(), content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+
+    def test_exported_csv_can_be_imported(self):
+        self.create_expenses(2)
+        self.client.post(reverse('expenses:expense-list-create'), {
+            'amount': '7.00', 'description': 'Synced', 'category': 'food', 'transaction_type': 'expense',
+            'client_id': '00000000-0000-4000-8000-000000000001',
+        }, format='json')
+        exported = b''.join(self.client.get(reverse('expenses:expense-export'), {'output': 'csv'}).streaming_content)
+
+        upload = SimpleUploadedFile('export.csv', exported, content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['unchanged'], response.data['errors']), (2, 1, []))
+
+    def test_blank_required_cell_is_reported(self):
+        content = 'amount,description,category,transaction_type\n,Bus,transport,expense\n'
+        upload = SimpleUploadedFile('import.csv', content.encode(), content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.data['errors'][0]['errors'])
+
+    def test_all_rows_invalid(self):
+        response = self.client.post(self.url, [{'amount': '0'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+
+    @override_settings(EXPENSE_BULK_MAX_ROWS=2)
+    def test_row_limit(self):
+        rows = [{'amount': '1', 'description': 'x', 'transaction_type': 'expense'}] * 3
+        self.assertEqual(self.client.post(self.url, rows, format='json').status_code, 400)
+
+    def test_rejects_non_list_payload(self):
+        self.assertEqual(self.client.post(self.url, {'amount': '1'}, format='json').status_code, 400)
+
+
+class ExpenseClientIdTests(ExpenseAPITestCase):
+    bulk_url = reverse('expenses:expense-bulk-create')
+    list_url = reverse('expenses:expense-list-create')
+
+    def rows(self, count, amount='1.00'):
+        return [
+            {'client_id': f'00000000-0000-4000-8000-{i:012d}', 'amount': amount, 'description': f'Row {i}',
+             'category': 'food', 'transaction_type': 'expense', 'date_created': '2024-03-05T10:00:00Z'}
+            for i in range(count)
+        ]
+
+    def test_replayed_batch_does_not_duplicate(self):
+        first = self.client.post(self.bulk_url, self.rows(5), format='json')
+        second = self.client.post(self.bulk_url, self.rows(5), format='json')
+
+        self.assertEqual(first.data['created'], 5)
+        self.assertEqual((second.data['created'], second.data['updated'], second.data['unchanged']), (0, 0, 5))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 5)
+        rollup = MonthlyRollup.objects.get(user=self.user)
+        self.assertEqual((rollup.total, rollup.count), (Decimal('5.00'), 5))
+
+    def test_replay_with_changes_updates_rows_and_rollups(self):
+        self.client.post(self.bulk_url, self.rows(3), format='json')
+        rows = self.rows(4, amount='2.00')
+        rows[0]['category'] = 'transport'
+
+        response = self.client.post(self.bulk_url, rows, format='json')
+
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 3))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 4)
+        totals = dict(MonthlyRollup.objects.filter(user=self.user).values_list('category', 'total'))
+        self.assertEqual(totals, {'food': Decimal('6.00'), 'transport': Decimal('2.00')})
+
+    def test_duplicate_client_id_within_request_keeps_last(self):
+        rows = self.rows(1) + self.rows(1, amount='9.00')
+        response = self.client.post(self.bulk_url, rows, format='json')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(Expense.objects.get(user=self.user).amount, Decimal('9.00'))
+
+    def test_client_ids_are_scoped_per_user(self):
+        other = User.objects.create_user(username='other', password='Secret123!')
+        Expense.objects.create(user=other, client_id=self.rows(1)[0]['client_id'], amount=1, description='x')
+
+        response = self.client.post(self.bulk_url, self.rows(1), format='json')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(Expense.objects.get(client_id=self.rows(1)[0]['client_id'], user=other).description, 'x')
+
+    def test_single_create_is_idempotent(self):
+        row = self.rows(1)[0]
+        first = self.client.post(self.list_url, row, format='json')
+        second = self.client.post(self.list_url, row, format='json')
+
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(MonthlyRollup.objects.get(user=self.user).count, 1)
+
+    def concurrent_insert(self, row):
+        """Insert `row` the way a concurrent request would, after the view's client_id lookup"""
+        Expense.objects.create(user=self.user, **dict(row, date_created=timezone.now()))
+
+    def test_concurrent_replay_returns_the_existing_row(self):
+        row = self.rows(1)[0]
+        perform_create = views.ExpenseListCreateAPIView.perform_create
+
+        def racing_perform_create(view, serializer):
+            self.concurrent_insert(row)
+            perform_create(view, serializer)
+
+        with mock.patch.object(views.ExpenseListCreateAPIView, 'perform_create', racing_perform_create):
+            response = self.client.post(self.list_url, row, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], Expense.objects.get(user=self.user).pk)
+
+    def test_concurrent_bulk_insert_is_retried_as_an_update(self):
+        rows = self.rows(2)
+        upsert = views._upsert_import_rows
+        calls = []
+
+        def racing_upsert(user, valid_rows):
+            calls.append(user)
+            if len(calls) > 1:
+                return upsert(user, valid_rows)
+            # The first attempt's lookup runs before the concurrent insert
+            self.concurrent_insert(rows[0])
+            with mock.patch.object(Expense.objects, 'filter', return_value=Expense.objects.none()):
+                return upsert(user, valid_rows)
+
+        with mock.patch('expenses.views._upsert_import_rows', racing_upsert):
+            response = self.client.post(self.bulk_url, rows, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+
+    def test_client_id_is_immutable(self):
+        row = self.rows(1)[0]
+        created = self.client.post(self.list_url, row, format='json')
+        url = reverse('expenses:expense-detail', args=[created.data['id']])
+
+        self.client.patch(url, {'client_id': '11111111-1111-4111-8111-111111111111'}, format='json')
+        self.assertEqual(str(Expense.objects.get().client_id), row['client_id'])
+
+
+@override_settings(EXPENSE_CHANGES_OVERLAP_SECONDS=0)
+class ExpenseChangesTests(ExpenseAPITestCase):
+    url = reverse('expenses:expense-changes')
+
+    def changes(self, token=None):
+        response = self.client.get(self.url, {'since': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_first_call_returns_everything(self):
+        self.create_expenses(3)
+        data = self.changes()
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['changed']), 3)
+        self.assertEqual(data['deleted'], [])
+
+    def test_only_changes_after_token_are_returned(self):
+        kept, edited, removed = self.create_expenses(3)
+        token = self.changes()['token']
+
+        self.client.patch(reverse('expenses:expense-detail', args=[edited.id]), {'amount': '99.00'}, format='json')
+        self.client.delete(reverse('expenses:expense-detail', args=[removed.id]))
+        added = self.client.post(reverse('expenses:expense-list-create'), {
+            'amount': '5.00', 'description': 'New', 'category': 'food', 'transaction_type': 'expense',
+        }, format='json').data
+
+        data = self.changes(token)
+        self.assertFalse(data['reset'])
+        self.assertEqual({row['id'] for row in data['changed']}, {edited.id, added['id']})
+        self.assertEqual(data['deleted'], [removed.id])
+
+        self.assertEqual(self.changes(data['token'])['changed'], [])
+
+    def test_reset_invalidates_older_tokens(self):
+        self.create_expenses(2)
+        token = self.changes()['token']
+        self.client.post(reverse('expenses:reset-data'))
+        self.create_expenses(1)
+
+        data = self.changes(token)
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['changed']), 1)
+
+    def test_bulk_upsert_bumps_updated_at(self):
+        row = {'client_id': '00000000-0000-4000-8000-000000000001', 'amount': '1.00', 'description': 'Row',
+               'category': 'food', 'transaction_type': 'expense'}
+        bulk_url = reverse('expenses:expense-bulk-create')
+        self.client.post(bulk_url, [row], format='json')
+        token = self.changes()['token']
+
+        self.client.post(bulk_url, [dict(row, amount='2.00')], format='json')
+        self.assertEqual([change['amount'] for change in self.changes(token)['changed']], ['2.00'])
+
+    def test_admin_reassignment_updates_the_previous_owner(self):
+        moved, kept = self.create_expenses(2)
+        other = User.objects.create_user(username='otheruser', password='Secret123!')
+        summary_url = reverse('expenses:expense-summary')
+        self.assertEqual(self.client.get(summary_url).data['expense_total'], Decimal('21.00'))
+        etag = self.client.get(summary_url)['ETag']
+        token = self.changes()['token']
+
+        moved = Expense.objects.get(pk=moved.pk)
+        moved.user = other
+        admin.site._registry[Expense].save_model(RequestFactory().post('/admin/'), moved, None, True)
+
+        self.assertEqual(self.client.get(summary_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(summary_url).data['expense_total'], kept.amount)
+        data = self.changes(token)
+        self.assertEqual((data['changed'], data['deleted']), ([], [moved.pk]))
+
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(summary_url).data['expense_total'], moved.amount)
+        self.assertEqual([row['id'] for row in self.changes(token)['changed']], [moved.pk])
+
+    @override_settings(EXPENSE_CHANGES_PAGE_SIZE=2)
+    def test_history_is_paged(self):
+        self.create_expenses(5)
+        first = self.changes()
+        self.assertTrue(first['reset'])
+        self.assertTrue(first['more'])
+
+        # Edited while paging, after the first page sent it: it comes again on the
+        # last page, and on the next sync
+        edited = first['changed'][0]['id']
+        self.client.patch(reverse('expenses:expense-detail', args=[edited]), {'amount': '1.00'}, format='json')
+
+        pages = [first]
+        while pages[-1]['more']:
+            pages.append(self.changes(pages[-1]['token']))
+            self.assertFalse(pages[-1]['reset'])
+        self.assertEqual([len(page['changed']) for page in pages], [2, 2, 2])
+        self.assertEqual(len({row['id'] for page in pages for row in page['changed']}), 5)
+
+        self.assertEqual(pages[-1]['changed'][-1]['id'], edited)
+        self.assertEqual([row['id'] for row in self.changes(pages[-1]['token'])['changed']], [edited])
+
+    def test_invalid_token(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'not-a-token'}).status_code, 400)
+        token = base64.urlsafe_b64encode(f'{timezone.now().isoformat()},x'.encode()).decode()
+        self.assertEqual(self.client.get(self.url, {'since': token}).status_code, 400)
+
+
+class ConditionalGetTests(ExpenseAPITestCase):
+    endpoints = {
+        'list': (views.ExpenseListCreateAPIView.as_view(), '/api/expenses/', {}),
+        'summary': (views.expense_summary, '/api/summary/', {}),
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.expense = self.create_expenses(3)[0]
+        self.endpoints = dict(self.endpoints, detail=(
+            views.ExpenseRetrieveUpdateDestroyAPIView.as_view(),
+            f'/api/expenses/{self.expense.pk}/',
+            {'pk': self.expense.pk},
+        ))
+
+    def get(self, name, **headers):
+        view, path, kwargs = self.endpoints[name]
+        request = APIRequestFactory().get(path, **headers)
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_matching_etag_gets_304_without_expense_queries(self):
+        for name in self.endpoints:
+            with self.subTest(name):
+                first, _ = self.get(name)
+                self.assertEqual(first.status_code, 200)
+                self.assertIn('no-cache', first['Cache-Control'])
+
+                response, queries = self.get(name, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], first['ETag'])
+                self.assertEqual(len(queries), 1)
+                self.assertFalse([sql for sql in queries if 'expenses_expense' in sql or 'monthlyrollup' in sql])
+
+    def test_if_modified_since_alone_never_gets_304(self):
+        first, _ = self.get('summary')
+        self.assertFalse(first.has_header('Last-Modified'))
+        # A write within the same second as the fetch must not be hidden
+        self.client.patch(reverse('expenses:expense-detail', args=[self.expense.pk]), {'amount': '1.00'}, format='json')
+        response, _ = self.get('summary', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_change_the_etag(self):
+        etag = self.get('list')[0]['ETag']
+        self.client.patch(reverse('expenses:expense-detail', args=[self.expense.pk]), {'amount': '1.00'}, format='json')
+        etag_after_update = self.get('list')[0]['ETag']
+        self.assertNotEqual(etag, etag_after_update)
+
+        response, _ = self.get('summary', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        self.client.delete(reverse('expenses:expense-detail', args=[self.expense.pk]))
+        self.assertNotEqual(self.get('list')[0]['ETag'], etag_after_update)
+
+    def test_archiving_changes_the_etag(self):
+        etag = self.get('summary')[0]['ETag']
+        Expense.objects.filter(pk=self.expense.pk).update(date_created=timezone.now() - timedelta(days=400))
+        call_command('purge_expenses', '--older-than-days', '365', stdout=io.StringIO())
+
+        response, _ = self.get('summary', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etags_are_per_user(self):
+        etag = self.get('list')[0]['ETag']
+        self.user = User.objects.create_user(username='other', password='Secret123!')
+        self.assertEqual(self.get('list', HTTP_IF_NONE_MATCH=etag)[0].status_code, 200)
+
+
+class SummaryCacheTests(ExpenseAPITestCase):
+    url = reverse('expenses:expense-summary')
+
+    def setUp(self):
+        super().setUp()
+        self.create_expenses(3)
+
+    def test_repeat_reads_hit_the_cache(self):
+        first = self.client.get(self.url).data
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url).data
+        self.assertEqual(first, second)
+        self.assertFalse([query for query in queries if 'monthlyrollup' in query['sql']])
+        self.assertEqual((caching.stats()['hits'], caching.stats()['misses']), (1, 1))
+
+    def test_writes_invalidate(self):
+        self.assertEqual(self.client.get(self.url).data['expense_total'], Decimal('33.00'))
+        expense = Expense.objects.filter(user=self.user).first()
+
+        self.client.patch(reverse('expenses:expense-detail', args=[expense.pk]), {'amount': '100.00'}, format='json')
+        total = self.client.get(self.url).data['expense_total']
+        self.assertEqual(total, Decimal('33.00') - expense.amount + Decimal('100.00'))
+
+        self.client.delete(reverse('expenses:expense-detail', args=[expense.pk]))
+        self.client.post(reverse('expenses:expense-list-create'), {
+            'amount': '1.00', 'description': 'New', 'category': 'food', 'transaction_type': 'expense',
+        }, format='json')
+        self.assertEqual(self.client.get(self.url).data['expense_total'], total - Decimal('100.00') + 1)
+
+        self.client.post(reverse('expenses:reset-data'))
+        self.assertEqual(self.client.get(self.url).data['expense_total'], 0)
+        self.assertEqual(caching.stats()['hits'], 0)
+
+    def test_stats_are_admin_only(self):
+        stats_url = reverse('expenses:summary-cache-stats')
+        self.assertEqual(self.client.get(stats_url).status_code, 403)
+
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.force_authenticate(User.objects.create_superuser('admin', password='Secret123!'))
+        response = self.client.get(stats_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['hit_ratio'], 0.5)
+
+
+class HealthCheckTests(ExpenseAPITestCase):
+    def test_liveness_does_no_database_work(self):
+        with self.assertNumQueries(0):
+            response = self.client_class().get(reverse('expenses:health-check'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ok')
+
+    def test_readiness_pings_the_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_class().get(reverse('expenses:readiness-check'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['database_ready'])
+        self.assertEqual([query['sql'] for query in queries], ['SELECT 1'])
+
+    @override_settings(HEALTH_READY_TIMEOUT=0)
+    def test_readiness_fails_past_the_timeout(self):
+        response = self.client_class().get(reverse('expenses:readiness-check'))
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['database_ready'])
+
+
+class SystemStatsTests(ExpenseAPITestCase):
+    url = reverse('expenses:system-stats')
+
+    def test_stats_are_admin_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_stats_come_from_rollups_and_are_cached(self):
+        self.create_expenses(3)
+        for amount in ('10.00', '11.00'):
+            self.client.post(reverse('expenses:expense-list-create'), {
+                'amount': amount, 'description': 'Salary', 'category': 'salary', 'transaction_type': 'income',
+            }, format='json')
+        self.client.force_authenticate(User.objects.create_superuser('admin', password='Secret123!'))
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = self.client.get(self.url).data
+        self.assertFalse([query for query in queries if 'expenses_expense' in query['sql']])
+        self.assertEqual(stats['transactions'], 5)
+        self.assertEqual(stats['expense_total'], Decimal('33.00'))
+        self.assertEqual(stats['income_total'], Decimal('21.00'))
+        self.assertEqual((stats['users'], stats['active_users']), (2, 1))
+
+        self.create_expenses(1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data['transactions'], 5)
+
+
+@override_settings(EXPENSE_RESET_BATCH_SIZE=4)
+class ResetDataTests(ExpenseAPITestCase):
+    url = reverse('expenses:reset-data')
+
+    def setUp(self):
+        super().setUp()
+        self.create_expenses(10)
+        self.other = User.objects.create_user(username='otheruser', password='Secret123!')
+        self.create_expenses(3, user=self.other)
+
+    def test_deletes_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url)
+        self.assertEqual(response.data['deleted_count'], 10)
+        self.assertFalse(Expense.objects.filter(user=self.user).exists())
+        self.assertEqual(Expense.objects.filter(user=self.other).count(), 3)
+        self.assertFalse(MonthlyRollup.objects.filter(user=self.user).exists())
+
+        # Soft deleted, one UPDATE per batch; purge_expenses removes the rows later
+        self.assertEqual(Expense.all_objects.filter(user=self.user, deleted_at__isnull=False).count(), 10)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "expenses_expense"')]
+        self.assertEqual(len(updates), 3)
+
+    def test_rows_added_during_a_reset_are_kept(self):
+        def add_expense(deleted):
+            if deleted == 4:
+                self.create_expenses(1)
+
+        self.assertEqual(services.delete_user_expenses(self.user, batch_size=4, progress=add_expense), 10)
+        services.user_data_reset(self.user)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(MonthlyRollup.objects.get(user=self.user).count, 1)
+
+    def test_async_reset_reports_progress(self):
+        with mock.patch('expenses.jobs.threading.Thread') as thread:
+            response = self.client.post(f'{self.url}?async=true')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['total'], 10)
+        thread.return_value.start.assert_called_once()
+
+        status_url = response.data['progress_url']
+        self.assertEqual(self.client.get(status_url).data['status'], 'running')
+        job, user = thread.call_args.kwargs['args']
+        jobs.run_reset(job, user)
+
+        data = self.client.get(status_url).data
+        self.assertEqual((data['status'], data['deleted'], data['total']), ('done', 10, 10))
+        self.assertFalse(Expense.objects.filter(user=self.user).exists())
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+
+
+class SoftDeleteTests(ExpenseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.expenses = self.create_expenses(4)
+
+    def delete(self, expense):
+        response = self.client.delete(reverse('expenses:expense-detail', args=[expense.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    def purge(self, *args):
+        call_command('purge_expenses', *args, '--batch-size', '2', stdout=io.StringIO())
+
+    def test_delete_only_flags_the_row(self):
+        expense = self.expenses[0]
+        self.delete(expense)
+
+        self.assertIsNotNone(Expense.all_objects.get(pk=expense.pk).deleted_at)
+        self.assertFalse(Expense.objects.filter(pk=expense.pk).exists())
+        self.assertTrue(ExpenseTombstone.objects.filter(expense_id=expense.pk).exists())
+        self.assertEqual(
+            self.client.get(reverse('expenses:expense-detail', args=[expense.pk])).status_code, 404,
+        )
+        self.assertEqual(len(self.client.get(reverse('expenses:expense-list-create')).data['results']), 3)
+
+    def test_client_id_can_be_reused_after_delete(self):
+        payload = {
+            'amount': '5.00', 'description': 'Tea', 'category': 'food', 'transaction_type': 'expense',
+            'client_id': '0b7f7a5e-5c38-4c1e-9a8e-2f1c7d4a9b10',
+        }
+        created = self.client.post(reverse('expenses:expense-list-create'), payload, format='json')
+        self.delete(Expense.objects.get(pk=created.data['id']))
+        again = self.client.post(reverse('expenses:expense-list-create'), payload, format='json')
+        self.assertEqual(again.status_code, 201)
+        self.assertNotEqual(again.data['id'], created.data['id'])
+
+    def test_purge_respects_the_grace_period(self):
+        for expense in self.expenses[:3]:
+            self.delete(expense)
+        Expense.all_objects.filter(pk=self.expenses[0].pk).update(deleted_at=timezone.now() - timedelta(days=8))
+
+        self.purge()
+        self.assertEqual(Expense.all_objects.filter(user=self.user).count(), 3)
+        self.purge('--deleted-days', '0')
+        self.assertEqual(Expense.all_objects.filter(user=self.user).count(), 1)
+        self.assertFalse(ExpenseArchive.objects.exists())
+
+    def test_purge_can_archive(self):
+        self.delete(self.expenses[0])
+        self.purge('--deleted-days', '0', '--archive')
+
+        archived = ExpenseArchive.objects.get()
+        self.assertEqual((archived.pk, archived.amount), (self.expenses[0].pk, self.expenses[0].amount))
+        self.assertIsNotNone(archived.deleted_at)
+        self.assertFalse(Expense.all_objects.filter(pk=self.expenses[0].pk).exists())
+
+    def test_archive_conflict_keeps_the_source_rows(self):
+        self.delete(self.expenses[0])
+        expense = Expense.all_objects.get(pk=self.expenses[0].pk)
+        ExpenseArchive.objects.create(
+            id=expense.pk, user=self.user, amount=1, description='Older copy', category='food',
+            transaction_type='expense', date_created=expense.date_created, updated_at=expense.updated_at,
+        )
+
+        with self.assertRaises(IntegrityError):
+            self.purge('--deleted-days', '0', '--archive')
+        self.assertTrue(Expense.all_objects.filter(pk=expense.pk).exists())
+        self.assertEqual(ExpenseArchive.objects.get().description, 'Older copy')
+
+    def age(self, expenses, days):
+        Expense.objects.filter(pk__in=[expense.pk for expense in expenses]).update(
+            date_created=timezone.now() - timedelta(days=days),
+        )
+        services.rebuild_rollups()
+        cache.clear()
+
+    def test_archived_transactions_stop_counting(self):
+        self.age(self.expenses[:2], 400)
+        self.purge('--older-than-days', '365')
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(ExpenseArchive.objects.filter(deleted_at=None).count(), 2)
+        self.assertEqual(
+            set(ExpenseTombstone.objects.values_list('expense_id', flat=True)),
+            {expense.pk for expense in self.expenses[:2]},
+        )
+
+        remaining = sum(expense.amount for expense in self.expenses[2:])
+        summary = self.client.get(reverse('expenses:expense-summary')).data
+        self.assertEqual(summary['expense_total'], float(remaining))
+        # rebuild_rollups agrees with the hooks
+        services.rebuild_rollups()
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('expenses:expense-summary')).data, summary)
+
+    def test_reset_removes_archived_transactions(self):
+        self.age(self.expenses[:1], 400)
+        self.purge('--older-than-days', '365')
+        self.delete(self.expenses[1])
+        self.purge('--deleted-days', '0', '--archive')
+        self.assertEqual(ExpenseArchive.objects.filter(user=self.user).count(), 2)
+
+        self.assertEqual(self.client.post(reverse('expenses:reset-data')).status_code, 200)
+        self.assertFalse(ExpenseArchive.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.get(reverse('expenses:expense-summary')).data['expense_total'], 0)
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'checks the SQLite query plan')
+    def test_list_uses_the_live_rows_index(self):
+        plan = Expense.objects.filter(user=self.user).order_by('-date_created', '-id').explain()
+        self.assertIn('expense_user_date_idx', plan)
+
+
+class GenerateDataTests(TestCase):
+    """The generate_data management command"""
+
+    def generate(self, *args):
+        call_command('generate_data', '--transactions', '50', *args, stdout=io.StringIO())
+
+    def rollups(self):
+        return sorted(MonthlyRollup.objects.values_list('user_id', 'month', 'category', 'transaction_type', 'total', 'count'))
+
+    def rows(self):
+        return list(Expense.objects.order_by('user__username', 'date_created', 'id').values_list(
+            'user__username', 'amount', 'category', 'transaction_type', 'date_created',
+        ))
+
+    def test_generates_users_and_transactions(self):
+        self.generate('--users', '3')
+
+        users = User.objects.filter(username__startswith='demo_user_')
+        self.assertEqual(users.count(), 3)
+        self.assertTrue(users[0].check_password('Demo123!'))
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 3)
+        self.assertEqual(Expense.objects.count(), 150)
+        categories = {value for value, _ in Expense.CATEGORY_CHOICES}
+        self.assertTrue(all(category in categories for _, _, category, _, _ in self.rows()))
+
+        # The rollups match a rebuild from the rows, also after adding to existing users
+        self.generate('--users', '3', '--seed', '1')
+        self.assertEqual(Expense.objects.count(), 300)
+        rollups = self.rollups()
+        services.rebuild_rollups()
+        self.assertEqual(rollups, self.rollups())
+
+    def test_output_depends_only_on_the_seed(self):
+        self.generate('--users', '2')
+        rows = self.rows()
+        Expense.objects.all().delete()
+
+        self.generate('--users', '2', '--processes', '2', '--batch-size', '7')
+        self.assertEqual(self.rows(), rows)
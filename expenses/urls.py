@@ -6,6 +6,7 @@ app_name = 'expenses'
 urlpatterns = [
     # Health check
     path('health/', views.health_check, name='health-check'),
+    path('health/ready/', views.readiness_check, name='readiness-check'),
     
     # Template views
     path('', views.dashboard, name='dashboard'),
@@ -13,6 +14,14 @@ urlpatterns = [
     # API endpoints
     path('api/expenses/', views.ExpenseListCreateAPIView.as_view(), name='expense-list-create'),
     path('api/expenses/<int:pk>/', views.ExpenseRetrieveUpdateDestroyAPIView.as_view(), name='expense-detail'),
+    path('api/expenses/bulk/', views.bulk_create_expenses, name='expense-bulk-create'),
+    path('api/expenses/export/', views.export_expenses, name='expense-export'),
+    path('api/expenses/changes/', views.expense_changes, name='expense-changes'),
     path('api/summary/', views.expense_summary, name='expense-summary'),
+    path('api/summary/monthly/', views.monthly_summary, name='monthly-summary'),
+    path('api/summary/cache-stats/', views.summary_cache_stats, name='summary-cache-stats'),
+    path('api/stats/', views.system_stats, name='system-stats'),
+    path('api/metrics/', views.request_metrics, name='request-metrics'),
     path('api/reset/', views.reset_data, name='reset-data'),
+    path('api/reset/<str:job_id>/', views.reset_status, name='reset-status'),
 ]
@@ -1,20 +1,37 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.contrib.auth.models import User
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Q, Sum
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import quote_etag
+import base64
+import csv
+import datetime
+import functools
+import io
+import json
 import logging
 import os
-from .models import Expense
-from .serializers import ExpenseSerializer
+from budget_tracker.db import ping
+from budget_tracker.instrumentation import registry, timed
+from . import caching, jobs, services
+from .models import Expense, ExpenseTombstone, MonthlyRollup, UserDataVersion
+from .pagination import ExpenseCursorPagination
+from .serializers import ExpenseImportSerializer, ExpenseRowSerializer, ExpenseSerializer
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -33,51 +50,110 @@ def vercel_csrf_exempt(view_func):
             return view_func(request, *args, **kwargs)
     return wrapper
 
-# Health check endpoint (no auth required)
+# Health check endpoints (no auth required)
 def health_check(request):
-    """Simple health check endpoint"""
+    """Liveness probe: the process is up and serving requests, no database work"""
+    return JsonResponse({
+        'status': 'ok',
+        'message': 'Budget Tracker API is running!',
+        'vercel_environment': bool(os.environ.get('VERCEL')),
+        'debug_mode': getattr(settings, 'DEBUG', False)
+    })
+
+def readiness_check(request):
+    """Readiness probe: the database answers SELECT 1 within HEALTH_READY_TIMEOUT"""
     try:
-        # Test database connection
-        expense_count = Expense.objects.count()
-        user_count = 0
-        
-        # Try to get user count if authenticated
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            user_count = Expense.objects.filter(user=request.user).count()
-        
-        return JsonResponse({
-            'status': 'ok', 
-            'message': 'Budget Tracker API is running!',
-            'database_ready': True,
-            'total_expenses_in_system': expense_count,
-            'user_expenses': user_count,
-            'vercel_environment': bool(os.environ.get('VERCEL')),
-            'debug_mode': getattr(settings, 'DEBUG', False)
-        })
-    except Exception as e:
+        database_ms = ping(connection, settings.HEALTH_READY_TIMEOUT)
+    except DatabaseError as e:
+        logger.warning(f"Readiness check failed: {e}")
         return JsonResponse({
             'status': 'error',
             'message': f'Database error: {str(e)}',
             'database_ready': False
-        }, status=500)
+        }, status=503)
+    return JsonResponse({
+        'status': 'ok',
+        'database_ready': True,
+        'database_ms': round(database_ms, 2)
+    })
+
+def conditional_get(request, respond):
+    """
+    Serve a GET with an ETag validator taken from the user's data version.
+    
+    A request whose If-None-Match still matches gets a 304 before
+    respond(version) is called, so no expense query or serialization runs.
+    No Last-Modified is sent: it has whole-second resolution, so a client
+    revalidating with If-Modified-Since would get a 304 after a write made in
+    the same second as its last fetch. The version orders every write.
+    """
+    version, _ = services.data_version(request.user)
+    etag = quote_etag(f'{request.user.pk}-{version}')
+    
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = respond(version)
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response.headers['ETag'] = etag
+    # Per-user data: never shared, always revalidated
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 # API Views (Authenticated)
 @method_decorator(csrf_exempt, name='dispatch')
 class ExpenseListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
     
     def get_queryset(self):
         """Return expenses for the current user only"""
         return Expense.objects.filter(user=self.request.user)
     
+    def get(self, request, *args, **kwargs):
+        get = functools.partial(super().get, request, *args, **kwargs)
+        return conditional_get(request, lambda version: get())
+    
+    def list(self, request, *args, **kwargs):
+        """Render pages from values_list rows instead of full ExpenseSerializer instances"""
+        queryset = self.get_queryset().values_list(*ExpenseRowSerializer.columns, named=True)
+        page = self.paginate_queryset(queryset)
+        serializer = ExpenseRowSerializer(username=request.user.username)
+        with timed(request, 'serialize'):
+            data = serializer.many(page)
+        return self.get_paginated_response(data)
+    
+    def create(self, request, *args, **kwargs):
+        """Creating is idempotent per client_id: a replayed POST returns the existing row"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        client_id = serializer.validated_data.get('client_id')
+        if client_id:
+            existing = self.get_queryset().filter(client_id=client_id).first()
+            if existing is not None:
+                return Response(self.get_serializer(existing).data, status=status.HTTP_200_OK)
+        
+        try:
+            self.perform_create(serializer)
+        except IntegrityError:
+            # A concurrent replay inserted the client_id between the lookup and the insert
+            existing = self.get_queryset().filter(client_id=client_id).first() if client_id else None
+            if existing is None:
+                raise
+            return Response(self.get_serializer(existing).data, status=status.HTTP_200_OK)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+    
     def perform_create(self, serializer):
         """Save the expense with the current user"""
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            expense = serializer.save(user=self.request.user)
+            services.expense_created(expense)
     
     def post(self, request, *args, **kwargs):
         try:
-            logger.info(f"User {request.user.username} creating expense: {request.data}")
+            logger.info(f"User {request.user.username} creating expense")
             return super().post(request, *args, **kwargs)
         except Exception as e:
             logger.error(f"Error creating expense for user {request.user.username}: {str(e)}")
@@ -94,26 +170,435 @@ class ExpenseRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView)
     def get_queryset(self):
         """Return expenses for the current user only"""
         return Expense.objects.filter(user=self.request.user)
+    
+    def get(self, request, *args, **kwargs):
+        get = functools.partial(super().get, request, *args, **kwargs)
+        return conditional_get(request, lambda version: get())
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            previous = services.snapshot(serializer.instance)
+            expense = serializer.save()
+            services.expense_updated(previous, expense)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            services.expense_deleted(instance)
+            # Only flagged here; purge_expenses removes the row from the table later
+            instance.soft_delete()
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def expense_summary(request):
-    """Get summary of income, expenses, and balance for current user"""
-    user_expenses = Expense.objects.filter(user=request.user)
+    """Get summary of income, expenses, balance and per-category totals for current user"""
+    return conditional_get(
+        request,
+        lambda version: Response(caching.get_summary(request.user, version, summarize)),
+    )
+
+def summarize(user):
+    """Income, expense and per-category totals of a user, read from the monthly rollups"""
+    # One grouped pass over the user's monthly rollups (months x categories rows, not
+    # transactions); the overall totals are folded from the groups
+    groups = (
+        MonthlyRollup.objects.filter(user=user)
+        .values('category', 'transaction_type')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by()
+    )
     
-    income_total = user_expenses.filter(transaction_type='income').aggregate(
-        total=Sum('amount'))['total'] or 0
-    expense_total = user_expenses.filter(transaction_type='expense').aggregate(
-        total=Sum('amount'))['total'] or 0
+    income_total = 0
+    expense_total = 0
+    categories = []
+    for group in groups:
+        if group['transaction_type'] == Expense.INCOME:
+            income_total += group['total']
+        elif group['transaction_type'] == Expense.EXPENSE:
+            expense_total += group['total']
+        categories.append(group)
+    categories.sort(key=lambda group: group['total'], reverse=True)
     balance = income_total - expense_total
     
-    return Response({
+    return {
         'income_total': income_total,
         'expense_total': expense_total,
         'balance': balance,
+        'categories': categories,
+        'user': user.username
+    }
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def summary_cache_stats(request):
+    """Hit/miss counters of the summary cache (admin only)"""
+    return Response(caching.stats())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def system_stats(request):
+    """System-wide totals from the stored counters, cached (admin only)"""
+    return Response(caching.get_system_stats(compute_system_stats))
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def request_metrics(request):
+    """Request timing quantiles of this worker in the Prometheus text format (admin only)"""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def compute_system_stats():
+    """Totals across all users, from the monthly rollups instead of the expenses table"""
+    totals = MonthlyRollup.objects.values('transaction_type').annotate(
+        total=Sum('total'), count=Sum('count'),
+    ).order_by()
+    by_type = {row['transaction_type']: row for row in totals}
+    return {
+        'users': User.objects.count(),
+        'active_users': UserDataVersion.objects.count(),
+        'transactions': sum(row['count'] for row in by_type.values()),
+        'income_total': by_type.get(Expense.INCOME, {}).get('total') or 0,
+        'expense_total': by_type.get(Expense.EXPENSE, {}).get('total') or 0,
+        'generated_at': timezone.now(),
+    }
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def monthly_summary(request):
+    """Get income, expense and balance per month for current user, oldest first"""
+    rollups = MonthlyRollup.objects.filter(user=request.user)
+    
+    # Optionally limit to the most recent N months
+    try:
+        months = int(request.query_params.get('months', 0))
+    except ValueError:
+        months = 0
+    if months > 0:
+        recent = (
+            rollups.values_list('month', flat=True).distinct().order_by('-month')[:months]
+        )
+        rollups = rollups.filter(month__in=list(recent))
+    
+    trend = {}
+    for rollup in rollups.values('month', 'transaction_type').annotate(total=Sum('total'), count=Sum('count')).order_by('month'):
+        entry = trend.setdefault(rollup['month'], {
+            'month': rollup['month'].strftime('%Y-%m'),
+            'income_total': 0,
+            'expense_total': 0,
+            'count': 0,
+        })
+        entry[f"{rollup['transaction_type']}_total"] += rollup['total']
+        entry['count'] += rollup['count']
+    
+    for entry in trend.values():
+        entry['balance'] = entry['income_total'] - entry['expense_total']
+    
+    return Response({
+        'months': list(trend.values()),
         'user': request.user.username
     })
 
+def _read_import_rows(request):
+    """Return the rows of a bulk import: an uploaded CSV file or a JSON array"""
+    upload = request.FILES.get('file')
+    if upload is not None:
+        try:
+            text = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValidationError({'file': 'CSV files must be UTF-8 encoded'})
+        # CSV has no null: a blank cell means the column was not given, so optional
+        # fields (client_id, date_created) are left out instead of failing validation
+        return [
+            {name: value for name, value in row.items() if value != ''}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    
+    rows = request.data
+    if isinstance(rows, dict):
+        rows = rows.get('transactions')
+    if not isinstance(rows, list):
+        raise ValidationError({'detail': 'Send a JSON array of transactions or upload a CSV file as "file"'})
+    return rows
+
+# Fields an upsert may overwrite on an existing transaction
+UPSERT_FIELDS = ['amount', 'description', 'category', 'transaction_type', 'date_created']
+
+def _upsert_import_rows(user, valid_rows):
+    """Write validated import rows for `user` in one transaction; return (created, updated)"""
+    created = []
+    updated = []
+    previous = []
+    batch_size = settings.EXPENSE_BULK_BATCH_SIZE
+    with transaction.atomic():
+        for start in range(0, len(valid_rows), batch_size):
+            batch = valid_rows[start:start + batch_size]
+            
+            # One indexed (user, client_id) lookup per batch finds the rows to update
+            client_ids = [row['client_id'] for row in batch if row.get('client_id')]
+            existing = {}
+            if client_ids:
+                existing = {
+                    expense.client_id: expense
+                    for expense in Expense.objects.filter(user=user, client_id__in=client_ids)
+                }
+            
+            new_expenses = []
+            changed_expenses = []
+            now = timezone.now()
+            for row in batch:
+                expense = existing.get(row.get('client_id'))
+                if expense is None:
+                    new_expenses.append(Expense(user=user, **row))
+                elif any(getattr(expense, field) != row[field] for field in UPSERT_FIELDS if field in row):
+                    previous.append(services.snapshot(expense))
+                    for field in UPSERT_FIELDS:
+                        if field in row:
+                            setattr(expense, field, row[field])
+                    # bulk_update() doesn't apply auto_now
+                    expense.updated_at = now
+                    changed_expenses.append(expense)
+            
+            Expense.objects.bulk_create(new_expenses)
+            if changed_expenses:
+                Expense.objects.bulk_update(changed_expenses, UPSERT_FIELDS + ['updated_at'])
+            created.extend(new_expenses)
+            updated.extend(changed_expenses)
+        
+        services.expenses_created(created)
+        services.expenses_updated(previous, updated)
+    return created, updated
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_create_expenses(request):
+    """
+    Create or update many transactions in one request.
+
+    Every row is validated with the same rules as POST /api/expenses/ and invalid
+    rows are reported by index. Valid rows are written in EXPENSE_BULK_BATCH_SIZE
+    batches inside one transaction. Rows carrying a client_id are upserted: a
+    transaction the server already has under that client_id is updated instead of
+    duplicated, so offline batches can be replayed safely.
+    """
+    rows = _read_import_rows(request)
+    max_rows = settings.EXPENSE_BULK_MAX_ROWS
+    if len(rows) > max_rows:
+        raise ValidationError({'detail': f'At most {max_rows} transactions can be imported per request'})
+    
+    # One serializer validates every row, instead of building (and deep-copying the
+    # fields of) a new serializer per row
+    serializer = ExpenseImportSerializer(context={'request': request})
+    valid_rows = {}
+    errors = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'index': index, 'errors': {'detail': ['Expected an object']}})
+            continue
+        try:
+            validated = serializer.run_validation(row)
+        except ValidationError as exc:
+            errors.append({'index': index, 'errors': exc.detail})
+        else:
+            # A client_id repeated within the request keeps its last version
+            valid_rows[validated.get('client_id') or ('index', index)] = validated
+    valid_rows = list(valid_rows.values())
+    
+    try:
+        created, updated = _upsert_import_rows(request.user, valid_rows)
+    except IntegrityError:
+        # A concurrent request inserted one of the client_ids after the lookup; the
+        # transaction was rolled back, and this time the lookup finds and updates the row
+        created, updated = _upsert_import_rows(request.user, valid_rows)
+    
+    logger.info(
+        f"User {request.user.username} bulk imported {len(created)} new and {len(updated)} updated "
+        f"transactions ({len(errors)} rejected)"
+    )
+    
+    return Response({
+        'created': len(created),
+        'updated': len(updated),
+        'unchanged': len(valid_rows) - len(created) - len(updated),
+        'errors': errors,
+    }, status=status.HTTP_400_BAD_REQUEST if errors and not valid_rows else status.HTTP_201_CREATED)
+
+class Echo:
+    """File-like object whose write() hands the value back, for streaming csv.writer output"""
+    def write(self, value):
+        return value
+
+def _parse_export_bound(value, name, end=False):
+    """
+    Parse a start/end filter given as a date or an ISO datetime. End bounds are
+    returned as an exclusive limit: the next midnight for a date, and the next
+    microsecond for a datetime.
+    """
+    try:
+        day = parse_date(value)
+        parsed = None if day else parse_datetime(value)
+    except ValueError:
+        day = parsed = None
+    if day is None and parsed is None:
+        raise ValidationError({name: f'Invalid date: {value}'})
+    
+    if day is not None:
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+        if end:
+            parsed += datetime.timedelta(days=1)
+    elif end:
+        parsed += datetime.timedelta(microseconds=1)
+    
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def _batched_lines(lines, size):
+    """Join lines into one string per `size` lines so the response isn't written row by row"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+def _export_ndjson(rows):
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for row in rows:
+        yield encode(row) + '\n'
+
+def _export_csv(rows):
+    writer = csv.writer(Echo())
+    columns = ExpenseRowSerializer.columns
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+EXPORT_FORMATS = {
+    'ndjson': (_export_ndjson, 'application/x-ndjson'),
+    'csv': (_export_csv, 'text/csv'),
+}
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_expenses(request):
+    """
+    Stream the current user's transactions as NDJSON (default) or CSV.
+
+    Query parameters: output=ndjson|csv, start and end (dates or ISO datetimes,
+    end dates are inclusive) and category (comma separated or repeated).
+    """
+    output = request.query_params.get('output', 'ndjson')
+    if output not in EXPORT_FORMATS:
+        raise ValidationError({'output': f"Choose one of: {', '.join(EXPORT_FORMATS)}"})
+    
+    queryset = Expense.objects.filter(user=request.user)
+    if request.query_params.get('start'):
+        queryset = queryset.filter(date_created__gte=_parse_export_bound(request.query_params['start'], 'start'))
+    if request.query_params.get('end'):
+        queryset = queryset.filter(date_created__lt=_parse_export_bound(request.query_params['end'], 'end', end=True))
+    categories = [
+        category
+        for value in request.query_params.getlist('category')
+        for category in value.split(',') if category
+    ]
+    if categories:
+        queryset = queryset.filter(category__in=categories)
+    
+    # Rows are fetched chunk by chunk and rendered one at a time, so memory use does
+    # not depend on how many transactions the user has
+    rows = queryset.order_by('date_created', 'id').values_list(*ExpenseRowSerializer.columns, named=True)
+    serializer = ExpenseRowSerializer(username=request.user.username)
+    rendered = (
+        serializer.to_representation(row)
+        for row in rows.iterator(chunk_size=settings.EXPENSE_EXPORT_CHUNK_SIZE)
+    )
+    
+    render_rows, content_type = EXPORT_FORMATS[output]
+    chunk_size = settings.EXPENSE_EXPORT_CHUNK_SIZE
+    response = StreamingHttpResponse(_batched_lines(render_rows(rendered), chunk_size), content_type=content_type)
+    filename = f"expenses-{request.user.username}-{timezone.now():%Y%m%d}.{output}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _encode_change_token(moment, cursor=None):
+    """A token for the changes since `moment`; with `cursor`, for the next page of them"""
+    parts = [moment.isoformat()]
+    if cursor is not None:
+        updated_at, pk = cursor
+        parts += [updated_at.isoformat(), str(pk)]
+    return base64.urlsafe_b64encode(','.join(parts).encode('ascii')).decode('ascii').rstrip('=')
+
+def _decode_change_token(token):
+    """(moment, cursor) from _encode_change_token; cursor is None unless more rows are pending"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii').split(',')
+        moments = [parse_datetime(part) for part in parts[:2]]
+        cursor = (moments[1], int(parts[2])) if len(parts) == 3 else None
+    except (TypeError, ValueError, UnicodeError):
+        parts = moments = []
+    if len(parts) not in (1, 3) or any(moment is None or timezone.is_naive(moment) for moment in moments):
+        raise ValidationError({'since': 'Invalid change token'})
+    return moments[0], cursor
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def expense_changes(request):
+    """
+    Transactions created, updated or deleted since a token from an earlier call.
+    
+    Without `since` (or when the user reset their data after it) the response has
+    reset=true and `changed` holds every transaction, so the client should replace
+    its copy. The returned token is passed as `since` on the next call. Tokens
+    overlap by EXPENSE_CHANGES_OVERLAP_SECONDS so writes that committed late are
+    not missed; clients apply changes by id, so repeats are harmless.
+    
+    At most EXPENSE_CHANGES_PAGE_SIZE rows are returned per call, in
+    (updated_at, id) order. When more are pending, `more` is true and the token
+    continues after the last row; the last page's token reaches back to the
+    start of the first, so whatever changed while paging is sent on the next sync.
+    """
+    issued_at = timezone.now()
+    expenses = Expense.objects.filter(user=request.user)
+    tombstones = ExpenseTombstone.objects.filter(user=request.user)
+    
+    since = request.query_params.get('since')
+    reset = not since
+    deleted = []
+    cursor = None
+    if since:
+        since, cursor = _decode_change_token(since)
+    if cursor is not None:
+        # A later page: the deletions and the reset flag came with the first one
+        issued_at = since
+        updated_at, pk = cursor
+        expenses = expenses.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+    elif since:
+        since -= datetime.timedelta(seconds=settings.EXPENSE_CHANGES_OVERLAP_SECONDS)
+        reset = tombstones.filter(expense_id=None, deleted_at__gte=since).exists()
+        if not reset:
+            expenses = expenses.filter(updated_at__gte=since)
+            deleted = list(
+                tombstones.filter(deleted_at__gte=since, expense_id__isnull=False)
+                .values_list('expense_id', flat=True)
+                .distinct()
+            )
+    
+    page_size = settings.EXPENSE_CHANGES_PAGE_SIZE
+    rows = list(
+        expenses.order_by('updated_at', 'id')
+        .values_list(*ExpenseRowSerializer.columns, named=True)[:page_size + 1]
+    )
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    return Response({
+        'reset': reset,
+        'changed': ExpenseRowSerializer(username=request.user.username).many(rows),
+        'deleted': deleted,
+        'more': more,
+        'token': _encode_change_token(issued_at, (rows[-1].updated_at, rows[-1].id) if more else None),
+    })
+
 @vercel_csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -135,17 +620,26 @@ def reset_data(request):
                 'error_type': 'authentication'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        # Delete all expenses for current user only - use a more robust approach
+        # ?async=true: delete in a background thread and report progress at /api/reset/<job_id>/
+        if request.query_params.get('async', '').lower() in ('1', 'true', 'yes'):
+            job = jobs.start_reset(user)
+            logger.info(f"User {username} started reset job {job['id']} for {job['total']} transactions")
+            return Response({
+                'status': 'accepted',
+                'message': 'Reset started.',
+                'job_id': job['id'],
+                'total': job['total'],
+                'progress_url': reverse('expenses:reset-status', args=[job['id']]),
+                'username': username,
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        # Delete all expenses for current user only, in short per-batch transactions
+        # so a large account never holds the write lock for the whole reset
         deleted_count = 0
         try:
-            # First count to verify we have access
-            expense_count = Expense.objects.filter(user=user).count()
-            logger.info(f"User {username} has {expense_count} expenses to delete")
-            
-            # Then delete
-            if expense_count > 0:
-                deleted_result = Expense.objects.filter(user=user).delete()
-                deleted_count = deleted_result[0] if deleted_result else 0
+            deleted_count = services.delete_user_expenses(user, batch_size=settings.EXPENSE_RESET_BATCH_SIZE)
+            with transaction.atomic():
+                services.user_data_reset(user)
             
             logger.info(f"User {username} reset their data. {deleted_count} transactions deleted.")
         except Exception as db_error:
@@ -187,6 +681,15 @@ def reset_data(request):
             'username': getattr(request.user, 'username', 'unknown')
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def reset_status(request, job_id):
+    """Progress of a background reset started by the current user"""
+    job = jobs.get_job(job_id)
+    if job is None or job['user_id'] != request.user.pk:
+        return Response({'status': 'error', 'message': 'Unknown reset job'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({key: value for key, value in job.items() if key != 'user_id'})
+
 # Template Views (Authenticated)
 @login_required
 def dashboard(request):